@@ -4,6 +4,11 @@ A python package for the MolSSI Software Summer School.
 """
 import mcpy.particles
 import mcpy.box
+import mcpy.neighbors
 import mcpy.integrator
 import mcpy.pairwise
-import mcpy.mcsimulation
\ No newline at end of file
+import mcpy.minimize
+import mcpy.jit
+import mcpy.mcsimulation
+import mcpy.xyz
+import mcpy.trajectory
\ No newline at end of file
@@ -1,4 +1,5 @@
 import numpy as np
+import mcpy.neighbors
 
 
 class Box:
@@ -19,9 +20,28 @@ class Box:
     ----------
     box_dims : np.array
         The dimensional lengths of the box, should be a numpy array ([x, y, z]).
+    inv_box_dims : np.array
+        The inverse box lengths, kept in step with `box_dims` when it is
+        assigned.
+    neighbors : CellList, VerletList, KDTreeNeighbors or None
+        The spatial decomposition used by `particle_distances`, if any.
+    images : np.array or None
+        Lattice translations summed over when the cutoff exceeds half the box
+        width, see `enable_images`.
     """
     def __init__(self, box_dims):
         self.box_dims = box_dims
+        self.neighbors = None
+        self.images = None
+
+    @property
+    def box_dims(self):
+        return self._box_dims
+
+    @box_dims.setter
+    def box_dims(self, box_dims):
+        self._box_dims = box_dims
+        self.inv_box_dims = 1.0 / np.asarray(box_dims, dtype=float)
 
     @property
     def volume(self):
@@ -34,6 +54,75 @@ class Box:
         """
         return np.prod(self.box_dims)
 
+    @property
+    def cell(self):
+        """The cell matrix, whose rows are the lattice vectors
+
+        Returns
+        -------
+        cell : np.array
+            Diagonal matrix of the box lengths.
+        """
+        return np.diag(np.asarray(self.box_dims, dtype=float))
+
+    @property
+    def widths(self):
+        """Perpendicular distances between opposite faces of the box
+
+        Returns
+        -------
+        widths : np.array
+            The width of the box along each lattice direction.
+        """
+        return np.asarray(self.box_dims, dtype=float)
+
+    def fractional(self, coordinates):
+        """Express coordinates as fractions of the box edges
+
+        Parameters
+        ----------
+        coordinates : np.array
+            Array of the atomic coordinates.
+
+        Returns
+        -------
+        fractional : np.array
+            The coordinates in units of the box edges, centred on zero.
+        """
+        return coordinates * self.inv_box_dims
+
+    def minimum_image(self, coord_ij):
+        """Replace separation vectors by their minimum image in place
+
+        Parameters
+        ----------
+        coord_ij : np.array
+            Array of separation vectors of shape (n, 3).
+
+        Returns
+        -------
+        coord_ij : np.array
+            The same array, holding the minimum image separations.
+        """
+        coord_ij -= self.box_dims * np.round(coord_ij / self.box_dims)
+        return coord_ij
+
+    def separations(self, first, second):
+        """Minimum image separation vectors between positions
+
+        Parameters
+        ----------
+        first, second : np.array
+            Positions of shape (..., 3) that broadcast against each other.
+
+        Returns
+        -------
+        coord_ij : np.array
+            The float64 minimum image separations `first - second`.
+        """
+        return self.minimum_image(np.subtract(first, second,
+                                              dtype=np.float64))
+
     def wrap(self, coordinates):
         """Wraps the coordinates within the box dimensions
 
@@ -72,6 +161,7 @@ class Box:
             Array of the distances between each i-th particle and remaining
             particles
         """
+        coordinates = np.asarray(coordinates, dtype=np.float64)
         if index != 0 and index != len(coordinates):
             coord_ij = coordinates[index, :] - coordinates[:index, :]
             temp = coordinates[index, :] - coordinates[index + 1:, :]
@@ -86,3 +176,688 @@ class Box:
             np.round(coord_ij / self.box_dims[np.newaxis, :])
         coord_ij2 = np.sum(np.square(coord_ij), axis=1)
         return coord_ij2
+
+    def minimum_image_distance_into(self, index, coordinates, out, work):
+        """Calculate the minimum image distances without allocating arrays.
+
+        Same arithmetic as `minimum_image_distance`, but the results go into
+        caller-owned buffers and the self-distance is kept in place with an
+        infinite sentinel instead of being cut out. The image shift uses the
+        precomputed `inv_box_dims`, so results agree bit for bit except for
+        separations lying exactly half a box length apart.
+
+        Parameters
+        ----------
+        index : int
+            index of the particle to take the minimum images for
+
+        coordinates : np.array
+            Array of the atomic xyz coordinate for all particles.
+
+        out : np.array
+            Float array of shape (n,) receiving the squared distances.
+
+        work : np.array
+            Float scratch array of shape (2, n, 3).
+
+        Returns
+        -------
+        out : np.array
+            Array of the squared distances between the i-th particle and
+            every particle, with `np.inf` at `index`.
+        """
+        coord_ij, shift = work
+        np.subtract(coordinates[index], coordinates, out=coord_ij,
+                    dtype=np.float64)
+        np.multiply(coord_ij, self.inv_box_dims, out=shift)
+        np.rint(shift, out=shift)
+        np.multiply(shift, self.box_dims, out=shift)
+        np.subtract(coord_ij, shift, out=coord_ij)
+        np.square(coord_ij, out=coord_ij)
+        np.add(coord_ij[:, 0], coord_ij[:, 1], out=out)
+        np.add(out, coord_ij[:, 2], out=out)
+        out[index] = np.inf
+        return out
+
+    def build_cell_list(self, coordinates, cutoff):
+        """Attach a linked-cell list to the box and bin the particles.
+
+        Parameters
+        ----------
+        coordinates : np.array
+            Array of the atomic xyz coordinate for all particles.
+        cutoff : float
+            The interaction cutoff. Cells are at least this wide.
+
+        Returns
+        -------
+        neighbors : CellList
+            The attached cell list.
+        """
+        self.neighbors = mcpy.neighbors.CellList(self, cutoff)
+        self.neighbors.build(coordinates)
+        return self.neighbors
+
+    def build_verlet_list(self, coordinates, cutoff, skin=0.3):
+        """Attach a Verlet neighbor list to the box and build it.
+
+        Parameters
+        ----------
+        coordinates : np.array
+            Array of the atomic xyz coordinate for all particles.
+        cutoff : float
+            The interaction cutoff.
+        skin : float, optional, default : 0.3
+            Extra distance beyond the cutoff kept in the list.
+
+        Returns
+        -------
+        neighbors : VerletList
+            The attached Verlet list.
+        """
+        self.neighbors = mcpy.neighbors.VerletList(self, cutoff, skin)
+        self.neighbors.build(coordinates)
+        return self.neighbors
+
+    def build_kdtree(self, coordinates, cutoff, skin=0.3):
+        """Attach a periodic KD-tree neighbor search to the box.
+
+        Parameters
+        ----------
+        coordinates : np.array
+            Array of the atomic xyz coordinate for all particles.
+        cutoff : float
+            The interaction cutoff.
+        skin : float, optional, default : 0.3
+            Allowed drift of the particles before the tree is rebuilt.
+
+        Returns
+        -------
+        neighbors : KDTreeNeighbors
+            The attached tree.
+        """
+        self.neighbors = mcpy.neighbors.KDTreeNeighbors(self, cutoff, skin)
+        self.neighbors.build(coordinates)
+        return self.neighbors
+
+    def distance_block(self, coordinates, indices=None, positions=None,
+                       cutoff=None, sparse=False):
+        """Squared minimum image distances from several probes at once.
+
+        Probes are either particles, given by `indices`, or arbitrary points,
+        given by `positions`. Only the nearest image is considered.
+
+        Parameters
+        ----------
+        coordinates : np.array
+            Array of the atomic xyz coordinate for all particles.
+
+        indices : np.array or ParticleGroup, optional
+            Indices of the particles to use as probes. The positions of a
+            contiguous group are used without copying them.
+
+        positions : np.array, optional
+            Array of shape (m, 3) of points to use as probes. Exactly one of
+            `indices` and `positions` must be given.
+
+        cutoff : float, optional
+            If given, distances at or beyond `cutoff` are set to `np.inf`.
+
+        sparse : bool, optional
+            If true, return only the finite entries as (i, j, rij2) triples.
+
+        Returns
+        -------
+        coord_ij2 : np.array
+            Array of shape (m, n) of squared distances from each probe to
+            each particle, with `np.inf` where a probe particle meets itself.
+            Returned when `sparse` is false.
+        i, j, rij2 : np.array
+            Probe, particle and squared distance of each finite entry. The
+            probe is given by its particle index when `indices` is used and
+            by its row in `positions` otherwise. Returned when `sparse` is
+            true.
+        """
+        if (indices is None) == (positions is None):
+            raise ValueError("Give exactly one of indices and positions.")
+        if hasattr(indices, 'index_array'):
+            positions = coordinates[indices.indices]
+            indices = indices.index_array
+        elif indices is not None:
+            indices = np.asarray(indices)
+            positions = coordinates[indices]
+        coord_ij = self.separations(positions[:, np.newaxis, :],
+                                    coordinates[np.newaxis, :, :])
+        coord_ij2 = np.sum(np.square(coord_ij), axis=2)
+        if indices is not None:
+            coord_ij2[np.arange(len(indices)), indices] = np.inf
+        if cutoff is not None:
+            coord_ij2[coord_ij2 >= cutoff * cutoff] = np.inf
+        if not sparse:
+            return coord_ij2
+        i, j = np.nonzero(np.isfinite(coord_ij2))
+        rij2 = coord_ij2[i, j]
+        if indices is not None:
+            i = indices[i]
+        return i, j, rij2
+
+    def enable_images(self, cutoff):
+        """Sum over every periodic image within `cutoff` when required.
+
+        A single minimum image is only enough while the cutoff is at most
+        half the box width. Beyond that the lattice translations that can
+        bring an image within the cutoff are precomputed and used by
+        `particle_distances` from then on.
+
+        Parameters
+        ----------
+        cutoff : float
+            The interaction cutoff.
+
+        Returns
+        -------
+        images : np.array or None
+            The lattice translations of shape (m, 3), or None when the
+            minimum image is enough.
+        """
+        widths = self.widths
+        if cutoff <= 0.5 * widths.min():
+            self.images = None
+            return self.images
+        extent = np.ceil(cutoff / widths + 0.5).astype(int)
+        steps = np.stack(np.meshgrid(*[np.arange(-n, n + 1) for n in extent],
+                                     indexing='ij'), axis=-1).reshape(-1, 3)
+        images = steps @ self.cell
+        # Minimum image separations lie within the cell centred on zero.
+        corners = np.stack(np.meshgrid([-0.5, 0.5], [-0.5, 0.5], [-0.5, 0.5],
+                                       indexing='ij'), axis=-1).reshape(-1, 3)
+        reach = cutoff + np.max(np.linalg.norm(corners @ self.cell, axis=1))
+        self.images = images[np.linalg.norm(images, axis=1) < reach]
+        self.image_cutoff2 = cutoff * cutoff
+        return self.images
+
+    def image_distances(self, index, coordinates, return_indices=False):
+        """Squared distances to every periodic image within the cutoff.
+
+        Parameters
+        ----------
+        index : int
+            index of the particle to take the images for
+
+        coordinates : np.array
+            Array of the atomic xyz coordinate for all particles.
+
+        return_indices : bool, optional
+            If true, also return which particle each image belongs to.
+
+        Returns
+        -------
+        indices : np.array
+            The particle of each image. Only returned if `return_indices`.
+        coord_ij2 : np.array
+            Squared distances between the i-th particle and all images of the
+            remaining particles that lie within the cutoff set by
+            `enable_images`.
+        """
+        coord_ij = self.separations(coordinates[index],
+                                    np.delete(coordinates, index, axis=0))
+        coord_ij2 = np.sum(np.square(coord_ij[:, np.newaxis, :] +
+                                     self.images[np.newaxis, :, :]),
+                           axis=2).ravel()
+        inside = coord_ij2 < self.image_cutoff2
+        if not return_indices:
+            return coord_ij2[inside]
+        others = np.delete(np.arange(len(coordinates)), index)
+        indices = np.repeat(others, len(self.images))
+        return indices[inside], coord_ij2[inside]
+
+    def self_image_distances(self):
+        """Squared distances from a particle to its own periodic images.
+
+        Returns
+        -------
+        coord_ii2 : np.array
+            Squared lengths of the lattice translations within the cutoff set
+            by `enable_images`, empty when images are not enabled.
+        """
+        if self.images is None:
+            return np.zeros(0)
+        coord_ii2 = np.sum(np.square(self.images), axis=1)
+        return coord_ii2[(coord_ii2 > 0) & (coord_ii2 < self.image_cutoff2)]
+
+    def particle_distances(self, index, coordinates, out=None, work=None):
+        """Squared distances from a particle to its potential partners.
+
+        Uses the attached neighbor structure when there is one, in which case
+        only particles close enough to interact are returned. With images
+        enabled every image within the cutoff is returned. Otherwise falls
+        back to a minimum image scan over all other particles, which is
+        written into `out` and `work` when they are given.
+
+        Parameters
+        ----------
+        index : int
+            index of the particle to take the minimum images for
+
+        coordinates : np.array
+            Array of the atomic xyz coordinate for all particles.
+
+        out, work : np.array, optional
+            Scratch buffers for `minimum_image_distance_into`.
+
+        Returns
+        -------
+        coord_ij2 : np.array
+            Array of the squared distances between the i-th particle and its
+            potential partners. May hold `np.inf` for non-partners.
+        """
+        if self.neighbors is None:
+            if self.images is not None:
+                return self.image_distances(index, coordinates)
+            if out is not None:
+                return self.minimum_image_distance_into(index, coordinates,
+                                                        out, work)
+            return self.minimum_image_distance(index, coordinates)
+        return self.neighbors.query(index, coordinates)[1]
+
+    def particle_partners(self, index, coordinates, out=None, work=None):
+        """Potential partners of a particle and their squared distances.
+
+        Like `particle_distances`, but also tells which particle each
+        distance belongs to, as needed to look up pair parameters.
+
+        Parameters
+        ----------
+        index : int
+            index of the particle to take the minimum images for
+
+        coordinates : np.array
+            Array of the atomic xyz coordinate for all particles.
+
+        out, work : np.array, optional
+            Scratch buffers for `minimum_image_distance_into`.
+
+        Returns
+        -------
+        indices : np.array or None
+            The partner of each distance. None when there is one distance
+            per particle in order, with `np.inf` for the particle itself.
+        coord_ij2 : np.array
+            Array of the squared distances between the i-th particle and its
+            potential partners.
+        """
+        if self.neighbors is not None:
+            return self.neighbors.query(index, coordinates)
+        if self.images is not None:
+            return self.image_distances(index, coordinates,
+                                        return_indices=True)
+        if out is None:
+            num_particles = len(coordinates)
+            out = np.empty(num_particles)
+            work = np.empty((2, num_particles, 3))
+        return None, self.minimum_image_distance_into(index, coordinates,
+                                                      out, work)
+
+
+class TriclinicBox(Box):
+    """Periodic box shaped as a general parallelepiped.
+
+    Minimum images are found through fractional coordinates, so any cell
+    shape works. Use `Box` for orthorhombic cells, which is faster.
+
+    Parameters
+    ----------
+    cell : np.array
+        The cell matrix of shape (3, 3), whose rows are the lattice vectors
+        a, b and c.
+
+    Returns
+    -------
+    self : TriclinicBox
+        Returns an instance of itself.
+
+    Attributes
+    ----------
+    cell : np.array
+        The cell matrix, rows are the lattice vectors.
+    inv_cell : np.array
+        The inverse of the cell matrix, kept in step with `cell` when it is
+        assigned.
+    box_dims : np.array
+        The lengths of the lattice vectors.
+    """
+    def __init__(self, cell):
+        self.cell = cell
+        self.neighbors = None
+        self.images = None
+
+    @property
+    def cell(self):
+        return self._cell
+
+    @cell.setter
+    def cell(self, cell):
+        self._cell = np.asarray(cell, dtype=float)
+        self.inv_cell = np.linalg.inv(self._cell)
+        self.box_dims = np.linalg.norm(self._cell, axis=1)
+
+    @property
+    def volume(self):
+        """Calculate the box volume
+
+        Returns
+        -------
+        box volume : float
+            Computed box volume
+        """
+        return np.abs(np.linalg.det(self.cell))
+
+    @property
+    def widths(self):
+        """Perpendicular distances between opposite faces of the box
+
+        Returns
+        -------
+        widths : np.array
+            The width of the box along each lattice direction.
+        """
+        return 1.0 / np.linalg.norm(self.inv_cell, axis=0)
+
+    def fractional(self, coordinates):
+        """Express coordinates as fractions of the lattice vectors
+
+        Parameters
+        ----------
+        coordinates : np.array
+            Array of the atomic coordinates.
+
+        Returns
+        -------
+        fractional : np.array
+            The coordinates in units of the lattice vectors, centred on zero.
+        """
+        return coordinates @ self.inv_cell
+
+    def minimum_image(self, coord_ij):
+        """Replace separation vectors by their minimum image in place
+
+        Parameters
+        ----------
+        coord_ij : np.array
+            Array of separation vectors of shape (n, 3).
+
+        Returns
+        -------
+        coord_ij : np.array
+            The same array, holding the minimum image separations.
+        """
+        fractional = coord_ij @ self.inv_cell
+        fractional -= np.round(fractional)
+        np.matmul(fractional, self.cell, out=coord_ij)
+        return coord_ij
+
+    def wrap(self, coordinates):
+        """Wraps the coordinates into the cell
+
+        Parameters
+        ----------
+        coordinates : np.array
+            Array of the atomic coordinates.
+
+        Returns
+        -------
+        coordinates : np.array
+            Arrays of the wrapped atomic coordinates.
+        """
+        fractional = coordinates @ self.inv_cell
+        fractional -= np.round(fractional)
+        coordinates[...] = fractional @ self.cell
+        return coordinates
+
+    def minimum_image_distance(self, index, coordinates):
+        """Calculate the minimum distance between two atoms.
+
+        Parameters
+        ----------
+        index : int
+            index of the particle to take the minimum images for
+
+        coordinates : np.array
+            Array of the atomic xyz coordinate for all particles.
+
+        Returns
+        -------
+        coord_ij2 : np.array
+            Array of the distances between each i-th particle and remaining
+            particles
+        """
+        coord_ij = np.subtract(coordinates[index],
+                               np.delete(coordinates, index, axis=0),
+                               dtype=np.float64)
+        return np.sum(np.square(self.minimum_image(coord_ij)), axis=1)
+
+    def minimum_image_distance_into(self, index, coordinates, out, work):
+        """Calculate the minimum image distances without allocating arrays.
+
+        Parameters
+        ----------
+        index : int
+            index of the particle to take the minimum images for
+
+        coordinates : np.array
+            Array of the atomic xyz coordinate for all particles.
+
+        out : np.array
+            Float array of shape (n,) receiving the squared distances.
+
+        work : np.array
+            Float scratch array of shape (2, n, 3).
+
+        Returns
+        -------
+        out : np.array
+            Array of the squared distances between the i-th particle and
+            every particle, with `np.inf` at `index`.
+        """
+        coord_ij, fractional = work
+        np.subtract(coordinates[index], coordinates, out=coord_ij,
+                    dtype=np.float64)
+        np.matmul(coord_ij, self.inv_cell, out=fractional)
+        np.rint(fractional, out=coord_ij)
+        np.subtract(fractional, coord_ij, out=fractional)
+        np.matmul(fractional, self.cell, out=coord_ij)
+        np.square(coord_ij, out=coord_ij)
+        np.add(coord_ij[:, 0], coord_ij[:, 1], out=out)
+        np.add(out, coord_ij[:, 2], out=out)
+        out[index] = np.inf
+        return out
+
+
+class FixedPointBox(Box):
+    """Orthorhombic box for coordinates stored as 32-bit fixed-point numbers.
+
+    A position is held as np.uint32 ticks of `box_dims / 2**32` along each
+    edge, so unsigned overflow wraps positions into the box for free and
+    reinterpreting the difference of two positions as np.int32 gives the
+    minimum image. Used together with `FixedPointParticles`; float
+    coordinates are only needed for output and analysis.
+
+    Parameters
+    ----------
+    box_dims : np.array
+        The dimensional lengths of the box, should be a numpy array ([x, y, z]).
+
+    Returns
+    -------
+    self : FixedPointBox
+        Returns an instance of itself.
+
+    Attributes
+    ----------
+    tick : np.array
+        The length of one fixed-point step along each edge.
+    """
+    @Box.box_dims.setter
+    def box_dims(self, box_dims):
+        Box.box_dims.fset(self, box_dims)
+        self.tick = np.asarray(self.box_dims, dtype=float) / 2**32
+
+    def to_fixed(self, coordinates):
+        """Convert float coordinates to fixed-point ticks
+
+        Parameters
+        ----------
+        coordinates : np.array
+            Array of float coordinates, wrapped or not.
+
+        Returns
+        -------
+        fixed : np.array
+            np.uint32 array of the wrapped positions.
+        """
+        ticks = np.rint(np.asarray(coordinates, dtype=np.float64) / self.tick)
+        return ticks.astype(np.int64).astype(np.uint32)
+
+    def to_float(self, fixed):
+        """Convert fixed-point positions to float coordinates
+
+        Parameters
+        ----------
+        fixed : np.array
+            np.uint32 array of positions.
+
+        Returns
+        -------
+        coordinates : np.array
+            float64 coordinates within the box centred on zero.
+        """
+        return np.ascontiguousarray(fixed).view(np.int32) * self.tick
+
+    def to_ticks(self, displacement):
+        """Convert a float displacement to fixed-point ticks
+
+        Adding the result to a position and subtracting it again restores
+        the position exactly.
+
+        Parameters
+        ----------
+        displacement : np.array
+            Float displacement vector(s).
+
+        Returns
+        -------
+        ticks : np.array
+            np.uint32 displacement, negative steps held modulo 2**32.
+        """
+        return self.to_fixed(displacement)
+
+    def fractional(self, coordinates):
+        """Express coordinates as fractions of the box edges
+
+        Parameters
+        ----------
+        coordinates : np.array
+            Array of np.uint32 positions or float coordinates.
+
+        Returns
+        -------
+        fractional : np.array
+            The coordinates in units of the box edges, centred on zero.
+        """
+        if coordinates.dtype != np.uint32:
+            return super().fractional(coordinates)
+        return np.ascontiguousarray(coordinates).view(np.int32) / 2**32
+
+    def separations(self, first, second):
+        """Minimum image separation vectors between positions
+
+        Parameters
+        ----------
+        first, second : np.array
+            Positions of shape (..., 3) that broadcast against each other,
+            both np.uint32 or both float.
+
+        Returns
+        -------
+        coord_ij : np.array
+            The float64 minimum image separations `first - second`.
+        """
+        if first.dtype != np.uint32:
+            return super().separations(first, second)
+        return np.subtract(first, second).view(np.int32) * self.tick
+
+    def wrap(self, coordinates):
+        """Wraps the coordinates within the box dimensions
+
+        Fixed-point positions are always wrapped and returned unchanged.
+
+        Parameters
+        ----------
+        coordinates : np.array
+            Array of the atomic coordinates.
+
+        Returns
+        -------
+        coordinates : np.array
+            Arrays of the wrapped atomic coordinates.
+        """
+        if coordinates.dtype != np.uint32:
+            return super().wrap(coordinates)
+        return coordinates
+
+    def minimum_image_distance(self, index, coordinates):
+        """Calculate the minimum distance between two atoms.
+
+        Parameters
+        ----------
+        index : int
+            index of the particle to take the minimum images for
+
+        coordinates : np.array
+            Array of the np.uint32 positions of all particles.
+
+        Returns
+        -------
+        coord_ij2 : np.array
+            Array of the distances between each i-th particle and remaining
+            particles
+        """
+        coord_ij = self.separations(coordinates[index],
+                                    np.delete(coordinates, index, axis=0))
+        return np.sum(np.square(coord_ij), axis=1)
+
+    def minimum_image_distance_into(self, index, coordinates, out, work):
+        """Calculate the minimum image distances without allocating arrays.
+
+        Parameters
+        ----------
+        index : int
+            index of the particle to take the minimum images for
+
+        coordinates : np.array
+            Array of the np.uint32 positions of all particles.
+
+        out : np.array
+            Float array of shape (n,) receiving the squared distances.
+
+        work : np.array
+            Float scratch array of shape (2, n, 3).
+
+        Returns
+        -------
+        out : np.array
+            Array of the squared distances between the i-th particle and
+            every particle, with `np.inf` at `index`.
+        """
+        coord_ij, scratch = work
+        # The integer differences fill the first half of the float scratch.
+        num_particles = len(coordinates)
+        ticks = scratch.reshape(-1).view(np.uint32)[:3 * num_particles]
+        ticks = ticks.reshape(num_particles, 3)
+        np.subtract(coordinates[index], coordinates, out=ticks)
+        np.multiply(ticks.view(np.int32), self.tick, out=coord_ij)
+        np.square(coord_ij, out=coord_ij)
+        np.add(coord_ij[:, 0], coord_ij[:, 1], out=out)
+        np.add(out, coord_ij[:, 2], out=out)
+        out[index] = np.inf
+        return out
@@ -1,5 +1,5 @@
 import numpy as np
-import mcpy.particles
+import mcpy.jit
 
 
 class Integrator:
@@ -17,6 +17,12 @@ class Integrator:
         float less than 1, but larger than low_acceptance
     max_displacement : float, optional, default : 0.1
         The initial maximum displacement value in the move. 
+    group : str, optional, default : None
+        Name of the particle group to move, all particles if None.
+    backend : str, optional, default : 'numpy'
+        'numba' evaluates trial moves with the compiled kernels of
+        `mcpy.jit`, which the caller must have checked to support the
+        system. Usually set by MCSimulation.
 
     Return
     ------
@@ -35,6 +41,10 @@ class Integrator:
         float less than 1, but larger than low_acceptance
     max_displacement : float
         The initial maximum displacement value in the move.
+    group : str or None
+        Name of the particle group trial moves are restricted to.
+    backend : str
+        'numpy' or 'numba', how trial moves are evaluated.
     '''
     
     
@@ -42,11 +52,17 @@ class Integrator:
                  beta,
                  low_acceptance=0.38,
                  high_acceptance=0.42,
-                 max_displacement=0.1):
+                 max_displacement=0.1,
+                 group=None,
+                 backend='numpy'):
         self.beta = beta
         self.low_acceptance = low_acceptance
         self.high_acceptance = high_acceptance
         self.max_displacement = max_displacement
+        self.group = group
+        self.backend = backend
+        self._rij2 = np.empty(0)
+        self._work = np.empty((2, 0, 3))
 
     def get_particle_energy(self,
                             potential,
@@ -65,8 +81,8 @@ class Integrator:
             An array of atomic coordinates (x, y, z). Shape (n, 3), where
             n is the number of particles.
         box_object: class object
-            box_object.box_length is used. float.
-            The dimensions of the square box in reduced units.
+            box_object.particle_distances is used, so an attached neighbor
+            structure limits the work to nearby particles.
         i_particle : np.array
             An array of atomic particles (x, y, z). Shape (1, 3).
 
@@ -76,15 +92,64 @@ class Integrator:
         Total energy of particle i with the rest of the system.
         '''
 
-        rij2 = box_object.minimum_image_distance(i_particle,
-                                                 particles.coordinates
-                                                 )
+        num_particles = particles.num_particles
+        if len(self._rij2) != num_particles:
+            self._rij2 = np.empty(num_particles)
+            self._work = np.empty((2, num_particles, 3))
+        if potential.num_types > 1:
+            # Pair parameters are gathered from the types of both particles.
+            indices, rij2 = box_object.particle_partners(i_particle,
+                                                         particles.coordinates,
+                                                         out=self._rij2,
+                                                         work=self._work)
+            types = particles.types
+            partner_types = types if indices is None else types[indices]
+            return potential(rij2, types[i_particle], partner_types)
+        rij2 = box_object.particle_distances(i_particle,
+                                             particles.coordinates,
+                                             out=self._rij2,
+                                             work=self._work
+                                             )
 
         e_pair = potential(rij2)
         # pair_energy_object needs to be replaced by corresponding function.
 
         return e_pair
 
+    def get_particle_contacts(self,
+                              potential,
+                              particles,
+                              box_object,
+                              i_particle):
+        ''' Finds the particles in contact with a particle.
+
+        Parameters
+        ----------
+        potential : class Pairwise object
+            A pairwise potential with a `partners` method, such as SW.
+        particles : class object
+            particles.coordinates is what will be used.
+        box_object: class object
+            box_object.particle_partners is used.
+        i_particle : int
+            The particle to find the contacts of.
+
+        Returns
+        -------
+        partners : np.array or None
+            Indices of the contacting particles, None on an overlap.
+        '''
+
+        num_particles = particles.num_particles
+        if len(self._rij2) != num_particles:
+            self._rij2 = np.empty(num_particles)
+            self._work = np.empty((2, num_particles, 3))
+        indices, rij2 = box_object.particle_partners(i_particle,
+                                                     particles.coordinates,
+                                                     out=self._rij2,
+                                                     work=self._work)
+        return potential.partners(indices, rij2)
+
     def accept_or_reject(self, delta_e):
         '''Accept or reject a given move based on the Metropolis Criteria.
 
@@ -92,6 +157,7 @@ class Integrator:
         ----------
         delta_e : double
             The energy difference between the current step and the previous step.
+            An infinite or nan difference is always rejected.
 
         Returns
         -------
@@ -102,6 +168,11 @@ class Integrator:
         if delta_e < 0.0:
             accept = True
 
+        elif not delta_e < np.inf:
+            # An overlap, or a move out of one (inf - inf), is rejected
+            # outright without evaluating the Boltzmann factor.
+            accept = False
+
         else:
             random_number = np.random.rand(1)
             p_acc = np.exp(-self.beta * delta_e)
@@ -164,28 +235,71 @@ class Integrator:
             The energy change before and after the current trial move.
 
         '''
-        i_particle = np.random.randint(particles.num_particles)
+        if self.group is None:
+            i_particle = np.random.randint(particles.num_particles)
+        else:
+            members = particles.groups[self.group].indices
+            if isinstance(members, slice):
+                i_particle = np.random.randint(members.start, members.stop)
+            else:
+                i_particle = members[np.random.randint(len(members))]
         random_displacement = (2.0 * np.random.rand(3) - 1.0) * \
             self.max_displacement
 
-        old_energy = self.get_particle_energy(potential,
-                                              particles,
-                                              box,
-                                              i_particle)
-        proposed_coordinates = particles.coordinates.copy()
-        proposed_coordinates[i_particle] += random_displacement
-        proposed_particles = mcpy.particles.Particles(proposed_coordinates)
-
-        new_energy = self.get_particle_energy(potential,
-                                              proposed_particles,
-                                              box,
-                                              i_particle)
+        if self.backend == 'numba':
+            # One compiled pass gives both energies, so the particle only
+            # moves once the trial is accepted.
+            old_energy, new_energy = mcpy.jit.trial_energies(
+                potential, particles, box, i_particle, random_displacement)
+        elif potential.contacts is not None:
+            # Tracked contacts are counted from the partner indices, which
+            # also tell the counts of which particles change on acceptance.
+            old_partners = self.get_particle_contacts(potential,
+                                                      particles,
+                                                      box,
+                                                      i_particle)
+            undo = particles.displace(i_particle, random_displacement)
+            new_partners = self.get_particle_contacts(potential,
+                                                      particles,
+                                                      box,
+                                                      i_particle)
+            old_energy, new_energy = [
+                np.inf if partners is None
+                else -potential.epsilon * len(partners)
+                for partners in (old_partners, new_partners)]
+        else:
+            if potential.hard:
+                # Allowed configurations have zero energy, only the trial
+                # position needs an overlap test.
+                old_energy = 0.0
+            else:
+                old_energy = self.get_particle_energy(potential,
+                                                      particles,
+                                                      box,
+                                                      i_particle)
+            # Move the particle in place and restore it on rejection, so
+            # the cost of a trial does not grow with the number of
+            # particles.
+            undo = particles.displace(i_particle, random_displacement)
+
+            new_energy = self.get_particle_energy(potential,
+                                                  particles,
+                                                  box,
+                                                  i_particle)
         delta_e = new_energy - old_energy
 
         acceptance = self.accept_or_reject(delta_e)
-        if acceptance is True:
-            particles.coordinates[i_particle] = \
-                proposed_coordinates[i_particle]
+        if self.backend == 'numba':
+            if acceptance is True:
+                particles.displace(i_particle, random_displacement)
+        elif acceptance is True:
+            if potential.contacts is not None:
+                potential.move_contacts(i_particle, old_partners,
+                                        new_partners)
+            if box.neighbors is not None:
+                box.neighbors.update(i_particle, particles.coordinates)
+        else:
+            particles.restore(i_particle, undo)
         if tune_displacement:
             self.max_displacement = self.adjust_displacement(
                 self.max_displacement,
@@ -0,0 +1,251 @@
+"""
+jit.py
+Optional Numba compiled kernels for single-species Lennard-Jones and hard
+sphere systems in an orthorhombic Box.
+
+Each kernel fuses the minimum image, the cutoff test and the pair energy
+into one loop without intermediate arrays. The hard-sphere kernels return
+as soon as they find an overlap. The kernels are plain Python
+functions when Numba is not installed, `available` tells which.
+"""
+
+import numpy as np
+import mcpy.box
+import mcpy.pairwise
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+available = numba is not None
+
+
+def _jit(function):
+    if numba is None:
+        return function
+    return numba.njit(cache=True)(function)
+
+
+@_jit
+def _particle_energy(coordinates, index, position, box_dims, inv_box_dims,
+                     sigma2, epsilon4, cutoff2):
+    energy = 0.0
+    for j in range(coordinates.shape[0]):
+        if j == index:
+            continue
+        rij2 = 0.0
+        for k in range(3):
+            d = np.float64(position[k]) - np.float64(coordinates[j, k])
+            d -= box_dims[k] * round(d * inv_box_dims[k])
+            rij2 += d * d
+        if rij2 >= cutoff2:
+            continue
+        s6 = sigma2 / rij2
+        s6 = s6 * s6 * s6
+        energy += s6 * (s6 - 1.0)
+    return epsilon4 * energy
+
+
+@_jit
+def _trial_energies(coordinates, index, position, box_dims, inv_box_dims,
+                    sigma2, epsilon4, cutoff2):
+    old_energy = 0.0
+    new_energy = 0.0
+    for j in range(coordinates.shape[0]):
+        if j == index:
+            continue
+        old_rij2 = 0.0
+        new_rij2 = 0.0
+        for k in range(3):
+            other = np.float64(coordinates[j, k])
+            d = np.float64(coordinates[index, k]) - other
+            old_d = d - box_dims[k] * round(d * inv_box_dims[k])
+            d = np.float64(position[k]) - other
+            new_d = d - box_dims[k] * round(d * inv_box_dims[k])
+            old_rij2 += old_d * old_d
+            new_rij2 += new_d * new_d
+        if old_rij2 < cutoff2:
+            s6 = sigma2 / old_rij2
+            s6 = s6 * s6 * s6
+            old_energy += s6 * (s6 - 1.0)
+        if new_rij2 < cutoff2:
+            s6 = sigma2 / new_rij2
+            s6 = s6 * s6 * s6
+            new_energy += s6 * (s6 - 1.0)
+    return epsilon4 * old_energy, epsilon4 * new_energy
+
+
+@_jit
+def _total_energy(coordinates, box_dims, inv_box_dims, sigma2, epsilon4,
+                  cutoff2):
+    energy = 0.0
+    num_particles = coordinates.shape[0]
+    for i in range(num_particles - 1):
+        for j in range(i + 1, num_particles):
+            rij2 = 0.0
+            for k in range(3):
+                d = np.float64(coordinates[i, k]) - \
+                    np.float64(coordinates[j, k])
+                d -= box_dims[k] * round(d * inv_box_dims[k])
+                rij2 += d * d
+            if rij2 >= cutoff2:
+                continue
+            s6 = sigma2 / rij2
+            s6 = s6 * s6 * s6
+            energy += s6 * (s6 - 1.0)
+    return epsilon4 * energy
+
+
+@_jit
+def _overlaps(coordinates, index, position, box_dims, inv_box_dims, sigma2):
+    for j in range(coordinates.shape[0]):
+        if j == index:
+            continue
+        rij2 = 0.0
+        for k in range(3):
+            d = np.float64(position[k]) - np.float64(coordinates[j, k])
+            d -= box_dims[k] * round(d * inv_box_dims[k])
+            rij2 += d * d
+        if rij2 < sigma2:
+            return True
+    return False
+
+
+@_jit
+def _any_overlap(coordinates, box_dims, inv_box_dims, sigma2):
+    for i in range(coordinates.shape[0] - 1):
+        if _overlaps(coordinates[i + 1:], -1, coordinates[i], box_dims,
+                     inv_box_dims, sigma2):
+            return True
+    return False
+
+
+def supports(potential, particles, box):
+    '''Whether the compiled kernels can handle a system.
+
+    Parameters
+    ----------
+    potential : class Pairwise object
+        Must be a single-species LJ or HS potential.
+    particles : Particles class object
+        Must hold float coordinates.
+    box : Box class object
+        Must be an orthorhombic Box without neighbor structure or images.
+
+    Returns
+    -------
+    supported : bool
+        True if the kernels give the same energies as the NumPy path.
+    '''
+    return (type(potential) in (mcpy.pairwise.LJ, mcpy.pairwise.HS) and
+            potential.num_types == 1 and
+            type(box) is mcpy.box.Box and
+            box.neighbors is None and
+            box.images is None and
+            particles.coordinates.dtype.kind == 'f')
+
+
+def _box_arguments(box):
+    box_dims = np.asarray(box.box_dims, dtype=np.float64)
+    return box_dims, 1.0 / box_dims
+
+
+def _arguments(potential, box):
+    box_dims = np.asarray(box.box_dims, dtype=np.float64)
+    return (box_dims, 1.0 / box_dims,
+            float(potential.sigma2_table[0, 0]),
+            4.0 * float(potential.epsilon_table[0, 0]),
+            float(potential.cutoff2))
+
+
+def particle_energy(potential, particles, box, index):
+    '''Energy of one particle with all others.
+
+    Parameters
+    ----------
+    potential : LJ or HS
+        The pair potential.
+    particles : Particles class object
+        The particles, `particles.coordinates` is used.
+    box : Box class object
+        The periodic box.
+    index : int
+        The particle to take the energy of.
+
+    Returns
+    -------
+    e_pair : float
+        Total energy of the particle with the rest of the system.
+    '''
+    coordinates = particles.coordinates
+    if potential.hard:
+        overlap = _overlaps(coordinates, index, coordinates[index],
+                            *_box_arguments(box), potential.cutoff2)
+        return np.inf if overlap else 0.0
+    return _particle_energy(coordinates, index, coordinates[index],
+                            *_arguments(potential, box))
+
+
+def trial_energies(potential, particles, box, index, displacement):
+    '''Energy of one particle before and after a trial displacement.
+
+    Both energies come out of a single pass over the other particles and
+    the coordinates are not modified.
+
+    Parameters
+    ----------
+    potential : LJ or HS
+        The pair potential.
+    particles : Particles class object
+        The particles, `particles.coordinates` is used.
+    box : Box class object
+        The periodic box.
+    index : int
+        The particle to move.
+    displacement : np.array
+        Array of shape (3,) of the trial move.
+
+    Returns
+    -------
+    old_energy, new_energy : float
+        Energy of the particle at its current and its trial position.
+    '''
+    # The trial position is rounded to the storage precision, as
+    # `Particles.displace` stores it, so an accepted energy change is that
+    # of the stored configuration.
+    coordinates = particles.coordinates
+    position = coordinates[index] + displacement
+    position = position.astype(coordinates.dtype)
+    if potential.hard:
+        # Allowed configurations have zero energy, only the trial position
+        # is tested for overlaps.
+        overlap = _overlaps(coordinates, index, position,
+                            *_box_arguments(box), potential.cutoff2)
+        return 0.0, np.inf if overlap else 0.0
+    return _trial_energies(coordinates, index, position,
+                           *_arguments(potential, box))
+
+
+def total_energy(potential, particles, box):
+    '''Sum of the pair energies over all pairs, without tail correction.
+
+    Parameters
+    ----------
+    potential : LJ or HS
+        The pair potential.
+    particles : Particles class object
+        The particles, `particles.coordinates` is used.
+    box : Box class object
+        The periodic box.
+
+    Returns
+    -------
+    e_total : float
+        The total pair energy.
+    '''
+    if potential.hard:
+        overlap = _any_overlap(particles.coordinates, *_box_arguments(box),
+                               potential.cutoff2)
+        return np.inf if overlap else 0.0
+    return _total_energy(particles.coordinates, *_arguments(potential, box))
@@ -2,7 +2,11 @@
 other classes in mcpy to provide a simple interface to run MC simulations.
 '''
 
+import warnings
 import numpy as np
+import mcpy.jit
+import mcpy.minimize
+import mcpy.neighbors
 
 
 class CounterIndex(object):
@@ -26,6 +30,20 @@ class MCSimulation(object):
         If true asks integrators to tune the trial move.
     frequency : int, optional
         Determines when to log data to std_out, default 10000.
+    block_size : int, optional
+        Number of rows per tile when summing all pairs for the total energy,
+        default 256. A tile holds about 24 * block_size * n bytes.
+    cell_list_threshold : int, optional
+        Number of particles from which the total energy is summed over a
+        cell list, default 1000.
+    reorder_frequency : int, optional
+        If given, particles are sorted along a space-filling curve every
+        `reorder_frequency` steps, default None.
+    backend : str, optional
+        'numpy' (default) or 'numba'. The Numba backend runs trial moves
+        and the total energy through the compiled kernels of `mcpy.jit`
+        and falls back to NumPy, with a warning, when Numba is missing or
+        the system is not supported.
 
     Returns
     -------
@@ -51,15 +69,40 @@ class MCSimulation(object):
         `self.step % self.frequency != 0` regardles of initialization.
     frequency : int
         Determines when to log data to std_out, default 10000.
+    trajectory : TrajectoryWriter, BufferedWriter or None
+        Where frames are written every `trajectory_stride` steps.
+    log_writer : BufferedWriter or None
+        Where log rows are written every `frequency` steps.
+    block_size : int
+        Number of rows per tile when summing all pairs for the total energy.
+    cell_list_threshold : int
+        Number of particles from which the total energy is summed over a
+        cell list.
+    reorder_frequency : int or None
+        Steps between sorting the particles along a space-filling curve.
+    backend : str
+        The requested backend, 'numpy' or 'numba'.
     '''
 
-    def __init__(self, tune_integrators=True, frequency=10000):
+    def __init__(self, tune_integrators=True, frequency=10000, block_size=256,
+                 cell_list_threshold=1000, reorder_frequency=None,
+                 backend='numpy'):
+        if backend not in ('numpy', 'numba'):
+            raise ValueError("Unknown backend {!r}, expected 'numpy' or "
+                             "'numba'.".format(backend))
         self._tuning = tune_integrators
         self.frequency = frequency
+        self.block_size = block_size
+        self.cell_list_threshold = cell_list_threshold
+        self.reorder_frequency = reorder_frequency
+        self.backend = backend
         self.step = 0
         self.steps_accepted = []
         self.integrators = []
         self._log_index = CounterIndex()
+        self.trajectory = None
+        self.trajectory_stride = 1
+        self.log_writer = None
 
     def run(self, steps, supress_output=False):
         '''Runs the simulation for `steps` steps.
@@ -68,6 +111,10 @@ class MCSimulation(object):
         standard output at `self.frequency` intervals as well. The last step is
         always printed as well.
 
+        While the energy is infinite, as for hard spheres started with
+        overlaps, it is recomputed after every accepted move instead of
+        being updated by the energy change.
+
         Parameters
         ----------
         steps : int
@@ -79,21 +126,63 @@ class MCSimulation(object):
         '''
         self.check_state()
         self._initialize_state(steps)
-        for i in range(steps):
-            for i, integrator in enumerate(self.integrators):
-                self.step += 1
-                acceptance_rate = self.steps_accepted[i] / self.step
-                accepted, delta_e = integrator(self.potential,
-                                               self.particles,
-                                               self.box,
-                                               acc_rate=acceptance_rate,
-                                               tune_displacement=self.tune)
-                if accepted:
-                    self.steps_accepted[i] += 1
-                    self.energy += delta_e
-                if self.step % self.frequency == 0:
-                    self.print_log(supress_output)
-                    self._update_log()
+        try:
+            for i in range(steps):
+                for i, integrator in enumerate(self.integrators):
+                    self.step += 1
+                    acceptance_rate = self.steps_accepted[i] / self.step
+                    accepted, delta_e = integrator(self.potential,
+                                                   self.particles,
+                                                   self.box,
+                                                   acc_rate=acceptance_rate,
+                                                   tune_displacement=self.tune)
+                    if accepted:
+                        self.steps_accepted[i] += 1
+                        if self.potential.contacts is not None:
+                            # Exact, however many moves were accepted.
+                            self.energy = self.potential.contact_energy()
+                        elif np.isfinite(self.energy):
+                            self.energy += delta_e
+                        else:
+                            # Moves out of an overlapping start do not tell
+                            # whether other overlaps remain.
+                            self.energy = self.calculate_total_energy()
+                    if self.step % self.frequency == 0:
+                        self.print_log(supress_output)
+                        self._update_log()
+                        if self.log_writer is not None:
+                            self.log_writer.write_log(
+                                self.step, self.energy,
+                                np.array(self.steps_accepted) / self.step)
+                    if self.trajectory is not None and \
+                            self.step % self.trajectory_stride == 0:
+                        self.trajectory.write_frame(
+                            self.particles.float_coordinates(),
+                            step=self.step,
+                            energy=self.energy,
+                            ids=self.particles.ids)
+                    if self.reorder_frequency and \
+                            self.step % self.reorder_frequency == 0:
+                        self.reorder_particles()
+        except BaseException:
+            # The error of the run is reported, not one of the writers.
+            self._flush_writers(raise_errors=False)
+            raise
+        self._flush_writers(raise_errors=True)
+
+    def _flush_writers(self, raise_errors):
+        '''Flushes every writer, even after one of them failed.'''
+        error = None
+        for writer in (self.trajectory, self.log_writer):
+            if writer is None:
+                continue
+            try:
+                writer.flush()
+            except Exception as writer_error:
+                if error is None:
+                    error = writer_error
+        if raise_errors and error is not None:
+            raise error
 
     def run_upto(self, step):
         '''Run until the simulation has reached the specified step.
@@ -113,6 +202,47 @@ class MCSimulation(object):
             return None
         self.run(step - self.step)
 
+    def minimize(self, minimizer=None):
+        '''Relax the particles to a nearby energy minimum.
+
+        Removes the overlaps of random starting configurations, so sampling
+        does not begin with a long high-rejection transient.
+
+        Parameters
+        ----------
+        minimizer : mcpy.minimize.Minimizer object, optional
+            The minimizer to use, defaults to FIRE with default settings.
+
+        Returns
+        -------
+        energy : float
+            The relaxed total energy.
+        '''
+        if minimizer is None:
+            minimizer = mcpy.minimize.Minimizer()
+        energy = minimizer(self.potential, self.particles, self.box)
+        if self.step > 0:
+            self.energy = self.calculate_total_energy()
+        return energy
+
+    def reorder_particles(self):
+        '''Sort the particles along a space-filling curve.
+
+        Keeps spatial neighbors close in memory. Particle identities are
+        kept in `self.particles.ids`, any neighbor structure is rebuilt and
+        tracked contacts are recounted.
+
+        Returns
+        -------
+        None
+        '''
+        self.particles.sort_spatially(self.box)
+        if self.box.neighbors is not None:
+            self.box.neighbors.build(self.particles.coordinates)
+        if self.potential.contacts is not None:
+            self.potential.track_contacts(self.box,
+                                          self.particles.coordinates)
+
     def _update_log(self):
         index = self._log_index()
         self.energies[index] = self.energy
@@ -120,6 +250,15 @@ class MCSimulation(object):
 
     def _initialize_state(self, steps):
         log_num = steps // self.frequency + 1
+        self.box.enable_images(self.potential.cutoff)
+        if self.box.neighbors is not None:
+            self.box.neighbors.build(self.particles.coordinates)
+        if self.potential.contacts is not None:
+            self.potential.track_contacts(self.box,
+                                          self.particles.coordinates)
+        backend = 'numba' if self._use_jit(warn=True) else 'numpy'
+        for integrator in self.integrators:
+            integrator.backend = backend
         if self.step == 0:
             self.steps = np.zeros(log_num)
             self.energies = np.zeros(log_num)
@@ -130,6 +269,23 @@ class MCSimulation(object):
                                         axis=None)
             self.energies = np.concatenate((self.energies, np.zeros(log_num)),
                                            axis=None)
+            if self.potential.contacts is not None:
+                self.energy = self.potential.contact_energy()
+
+    def _use_jit(self, warn=False):
+        '''Whether the compiled kernels are requested and can be used.'''
+        if self.backend != 'numba':
+            return False
+        if not mcpy.jit.available:
+            reason = "Numba is not installed"
+        elif not mcpy.jit.supports(self.potential, self.particles, self.box):
+            reason = "the system is not supported by mcpy.jit"
+        else:
+            return True
+        if warn:
+            warnings.warn("Falling back to the NumPy backend, {}."
+                          .format(reason), RuntimeWarning)
+        return False
 
     def add_integrator(self, integrator):
         '''Add integrator to list of simulation integrators.
@@ -189,21 +345,150 @@ class MCSimulation(object):
         '''
         self.particles = particles
 
+    def add_trajectory(self, trajectory, stride=1):
+        '''Add a trajectory to write frames to while running.
+
+        Parameters
+        ----------
+        trajectory : mcpy.trajectory.TrajectoryWriter object
+            Anything with `write_frame(coordinates, step, energy, ids)` and
+            `flush()` methods, such as a BufferedWriter.
+        stride : int, optional
+            A frame is written every `stride` steps, default 1.
+
+        Returns
+        -------
+        None
+        '''
+        self.trajectory = trajectory
+        self.trajectory_stride = stride
+
+    def add_log_writer(self, log_writer):
+        '''Add a writer receiving a log row at every logging step.
+
+        Parameters
+        ----------
+        log_writer : mcpy.trajectory.BufferedWriter object
+            Anything with `write_log(step, energy, acceptance_rates)` and
+            `flush()` methods.
+
+        Returns
+        -------
+        None
+        '''
+        self.log_writer = log_writer
+
     def calculate_total_energy(self):
         '''Calculate the current total energy.
 
         Uses the potential, particles, and box objects. Usually only needs to
-        be done at initialization though can be called at any time.
+        be done at initialization though can be called at any time. When the
+        box has a neighbor structure attached only its pairs are evaluated,
+        and one is set up on the fly for `cell_list_threshold` or more
+        particles. Otherwise all pairs are evaluated in tiles of `block_size`
+        rows. If the potential cutoff exceeds half the box width every
+        periodic image within the cutoff is included.
         '''
+        coordinates = self.particles.coordinates
+        num_particles = self.particles.num_particles
+        types = None
+        if self.potential.num_types > 1:
+            # Pair parameters are looked up from the types of both particles.
+            types = self.particles.types
+            type_counts = np.bincount(types,
+                                      minlength=self.potential.num_types)
+            e_correction = self.potential.cutoff_correction(
+                self.box, num_particles, type_counts)
+        else:
+            e_correction = self.potential.cutoff_correction(self.box,
+                                                            num_particles)
+        if self.box.enable_images(self.potential.cutoff) is not None:
+            e_total = 0
+            for i in np.arange(num_particles - 1):
+                if types is None:
+                    rij2 = self.box.particle_distances(0, coordinates[i:])
+                    e_total += self.potential(rij2)
+                else:
+                    j, rij2 = self.box.particle_partners(0, coordinates[i:])
+                    e_total += self.potential(rij2, types[i], types[i:][j])
+            # Each particle also interacts with its own periodic images.
+            rii2 = self.box.self_image_distances()
+            if types is None:
+                e_total += 0.5 * num_particles * self.potential(rii2)
+            else:
+                for a, count in enumerate(type_counts):
+                    e_total += 0.5 * count * self.potential(rii2, a, a)
+            return e_total + e_correction
+
+        if self._use_jit():
+            return mcpy.jit.total_energy(self.potential, self.particles,
+                                         self.box) + e_correction
+
+        neighbors = self.box.neighbors
+        if neighbors is None and num_particles >= self.cell_list_threshold:
+            neighbors = mcpy.neighbors.CellList(self.box,
+                                                self.potential.cutoff)
+            neighbors.build(coordinates)
+        if neighbors is not None:
+            i, j, rij2 = neighbors.pairs(coordinates)
+            if types is None:
+                return self.potential(rij2) + e_correction
+            return self.potential(rij2, types[i], types[j]) + e_correction
+
         e_total = 0
-        for i in np.arange(self.particles.num_particles - 1):
-            rij2 = self.box.minimum_image_distance(0,
-                    self.particles.coordinates[i:]
-            )
-            e_total += self.potential(rij2)
-        return e_total + self.potential.cutoff_correction(
-            self.box,
-            self.particles.num_particles)
+        for start in range(0, num_particles, self.block_size):
+            rows = np.arange(min(self.block_size, num_particles - start))
+            rij2 = self.box.distance_block(coordinates[start:], indices=rows)
+            # Keep each pair once, from the particle with the lower index.
+            columns = np.arange(rij2.shape[1])
+            rij2[columns[np.newaxis, :] <= rows[:, np.newaxis]] = np.inf
+            if types is None:
+                e_total += self.potential(rij2.ravel())
+            else:
+                e_total += self.potential(
+                    rij2, types[start + rows, np.newaxis],
+                    types[np.newaxis, start:])
+        return e_total + e_correction
+
+    def calculate_group_energy(self, name):
+        '''Calculate the energy of a particle group.
+
+        Sums every pair with at least one particle in the group, counting
+        pairs within the group once. Only the nearest image is considered
+        and no tail correction is added.
+
+        Parameters
+        ----------
+        name : str
+            Name of a group defined with `Particles.add_group`.
+
+        Returns
+        -------
+        e_group : float
+            Interaction energy of the group with itself and the rest.
+        '''
+        group = self.particles.group(name)
+        coordinates = self.particles.coordinates
+        num_particles = self.particles.num_particles
+        rows = group.index_array
+        in_group = np.zeros(num_particles, dtype=bool)
+        in_group[rows] = True
+        columns = np.arange(num_particles)
+        types = self.particles.types if self.potential.num_types > 1 \
+            else None
+        e_group = 0
+        for start in range(0, len(rows), self.block_size):
+            probes = rows[start:start + self.block_size]
+            rij2 = self.box.distance_block(coordinates, indices=probes)
+            # Keep pairs within the group once, from the lower index.
+            rij2[in_group[np.newaxis, :] &
+                 (columns[np.newaxis, :] < probes[:, np.newaxis])] = np.inf
+            if types is None:
+                e_group += self.potential(rij2.ravel())
+            else:
+                e_group += self.potential(rij2, types[probes, np.newaxis],
+                                          types[np.newaxis, :])
+        return e_group
 
     def check_state(self):
         '''Raises a RuntimeError if self is not ready to run.'''
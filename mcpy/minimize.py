@@ -0,0 +1,246 @@
+"""
+minimize.py
+Energy minimization to relax starting configurations before MC sampling.
+"""
+
+import numpy as np
+import mcpy.neighbors
+
+
+class Minimizer:
+    '''Relaxes particles to a nearby local energy minimum.
+
+    Forces are evaluated from the analytic pair forces of the potential with
+    the minimum image convention. The pairs within the cutoff plus a skin are
+    found once and reused until a particle has moved more than half the skin.
+
+    Parameters
+    ----------
+    method : str, optional, default : 'fire'
+        'fire' for the fast inertial relaxation engine or 'steepest' for
+        steepest descent with an adaptive step.
+    force_tolerance : float, optional, default : 1e-3
+        Stop once no particle feels a force larger than this.
+    max_iterations : int, optional, default : 10000
+        Stop after this many force evaluations.
+    max_step : float, optional, default : 0.1
+        No particle moves further than this in one iteration, which keeps
+        strongly overlapping random starts stable.
+    dt : float, optional, default : 0.002
+        Initial FIRE time step, in reduced units with unit masses.
+    dt_max : float, optional, default : 0.02
+        Largest FIRE time step.
+    skin : float, optional, default : 0.3
+        Extra distance added to the cutoff when listing pairs.
+
+    Returns
+    -------
+    self : Minimizer
+        Returns an instance of itself.
+
+    Attributes
+    ----------
+    num_iterations : int
+        Iterations taken by the last minimization.
+    max_force : float
+        Largest force magnitude at the end of the last minimization.
+    converged : bool
+        If the last minimization reached `force_tolerance`.
+    '''
+
+    def __init__(self,
+                 method='fire',
+                 force_tolerance=1e-3,
+                 max_iterations=10000,
+                 max_step=0.1,
+                 dt=0.002,
+                 dt_max=0.02,
+                 skin=0.3):
+        if method not in ('fire', 'steepest'):
+            raise ValueError("Unknown method {!r}, expected 'fire' or "
+                             "'steepest'.".format(method))
+        self.method = method
+        self.force_tolerance = force_tolerance
+        self.max_iterations = max_iterations
+        self.max_step = max_step
+        self.dt = dt
+        self.dt_max = dt_max
+        self.skin = skin
+        self.num_iterations = 0
+        self.max_force = np.inf
+        self.converged = False
+        self._pairs = None
+        self._reference = None
+
+    def _update_pairs(self, potential, box, coordinates):
+        if self._reference is not None:
+            moved2 = np.sum(np.square(coordinates - self._reference), axis=1)
+            if moved2.max() <= 0.25 * self.skin * self.skin:
+                return self._pairs
+        cutoff = potential.cutoff + self.skin
+        try:
+            cells = mcpy.neighbors.CellList(box, cutoff)
+        except ValueError:
+            # The box is too small for cells, every pair is a candidate.
+            self._pairs = np.triu_indices(len(coordinates), k=1)
+        else:
+            cells.build(coordinates)
+            self._pairs = cells.pairs(coordinates)[:2]
+        self._reference = coordinates.copy()
+        return self._pairs
+
+    def forces(self, potential, box, coordinates, types=None):
+        '''Pair energy and force on every particle.
+
+        Parameters
+        ----------
+        potential : class Pairwise object
+            A pairwise potential with a `force_factor` method.
+        box : Box class object
+            The periodic box the particles live in.
+        coordinates : np.array
+            Array of shape (n, 3) of the particle coordinates.
+        types : np.array, optional
+            Array of shape (n,) of particle types, for potentials with
+            parameters per pair of types.
+
+        Returns
+        -------
+        energy : float
+            Sum of the pair energies, without the tail correction.
+        forces : np.array
+            Array of shape (n, 3) of the total force on each particle.
+        '''
+        energy, forces, _ = self._evaluate(potential, box, coordinates, types)
+        return energy, forces
+
+    def _evaluate(self, potential, box, coordinates, types=None):
+        '''Energy, forces and the energy of the cutoff shifted potential.'''
+        i, j = self._update_pairs(potential, box, coordinates)
+        coord_ij = box.minimum_image(coordinates[i] - coordinates[j])
+        rij2 = np.sum(np.square(coord_ij), axis=1)
+        if types is None:
+            pair_types = ()
+            cutoff2 = potential.cutoff2
+        else:
+            pair_types = (types[i], types[j])
+            cutoff2 = potential.cutoff2_table[pair_types]
+        f_by_r = potential.force_factor(rij2, *pair_types)
+        f_ij = f_by_r[:, np.newaxis] * coord_ij
+        num_particles = len(coordinates)
+        forces = np.empty((num_particles, 3))
+        for k in range(3):
+            forces[:, k] = np.bincount(i, f_ij[:, k], num_particles) - \
+                np.bincount(j, f_ij[:, k], num_particles)
+        energy = potential(rij2, *pair_types)
+        # Pairs crossing the cutoff make the truncated energy jump, the
+        # shifted one is continuous and so usable to judge a descent step.
+        inside = rij2 < cutoff2
+        shifted = energy - np.sum(potential.potential(
+            np.broadcast_to(cutoff2, rij2.shape)[inside],
+            *[t[inside] for t in pair_types]))
+        return energy, forces, shifted
+
+    def _limit(self, displacement):
+        '''Scales down rows that would move further than max_step.'''
+        length = np.sqrt(np.sum(np.square(displacement), axis=1))
+        too_far = length > self.max_step
+        displacement[too_far] *= (self.max_step / length[too_far])[:, None]
+        return displacement
+
+    def _fire(self, potential, box, coordinates, types):
+        velocities = np.zeros_like(coordinates)
+        dt, alpha, since_uphill = self.dt, 0.1, 0
+        energy, forces = self.forces(potential, box, coordinates, types)
+        for iteration in range(self.max_iterations):
+            self.max_force = np.sqrt(np.sum(np.square(forces), axis=1).max())
+            if self.max_force <= self.force_tolerance:
+                self.converged = True
+                break
+            # The power is judged before the kick, which would otherwise
+            # add dt * |F|^2 and hide uphill motion.
+            power = np.vdot(forces, velocities)
+            if power > 0.0:
+                since_uphill += 1
+                if since_uphill > 5:
+                    dt = min(1.1 * dt, self.dt_max)
+                    alpha *= 0.99
+            else:
+                velocities[...] = 0.0
+                dt *= 0.5
+                alpha, since_uphill = 0.1, 0
+            velocities += dt * forces
+            scale = np.linalg.norm(velocities) / np.linalg.norm(forces)
+            velocities *= 1.0 - alpha
+            velocities += alpha * scale * forces
+            coordinates += self._limit(dt * velocities)
+            energy, forces = self.forces(potential, box, coordinates, types)
+        self.num_iterations = iteration + 1 if self.max_iterations else 0
+        return energy
+
+    def _steepest(self, potential, box, coordinates, types):
+        step = self.max_step
+        energy, forces, shifted = self._evaluate(potential, box, coordinates,
+                                                 types)
+        for iteration in range(self.max_iterations):
+            magnitudes = np.sqrt(np.sum(np.square(forces), axis=1))
+            self.max_force = magnitudes.max()
+            if self.max_force <= self.force_tolerance or step < 1e-12:
+                self.converged = self.max_force <= self.force_tolerance
+                break
+            # The particle with the largest force moves by `step`.
+            trial = coordinates + forces * (step / self.max_force)
+            trial_energy, trial_forces, trial_shifted = self._evaluate(
+                potential, box, trial, types)
+            if trial_shifted < shifted:
+                coordinates[...] = trial
+                energy, forces = trial_energy, trial_forces
+                shifted = trial_shifted
+                step = min(1.2 * step, self.max_step)
+            else:
+                step *= 0.5
+        self.num_iterations = iteration + 1 if self.max_iterations else 0
+        return energy
+
+    def __call__(self, potential, particles, box):
+        '''Minimize the energy and store the relaxed coordinates.
+
+        Parameters
+        ----------
+        potential : class Pairwise object
+            A pairwise potential with a `force_factor` method.
+        particles : Particles class object
+            The particles to relax, their coordinates are overwritten.
+        box : Box class object
+            The periodic box the particles live in. An attached neighbor
+            structure is rebuilt for the relaxed coordinates. The cutoff
+            may not exceed half the box width.
+
+        Returns
+        -------
+        energy : float
+            The relaxed total energy including the tail correction.
+        '''
+        if potential.cutoff > 0.5 * np.min(box.widths):
+            raise ValueError("Minimizer only uses the minimum image, the "
+                             "cutoff may not exceed half the box width.")
+        coordinates = np.array(particles.float_coordinates(),
+                               dtype=np.float64)
+        self.converged = False
+        self._reference = None
+        types = None
+        if potential.num_types > 1:
+            types = particles.types
+        if self.method == 'fire':
+            energy = self._fire(potential, box, coordinates, types)
+        else:
+            energy = self._steepest(potential, box, coordinates, types)
+        particles.coordinates = coordinates
+        if box.neighbors is not None:
+            box.neighbors.build(particles.coordinates)
+        if types is None:
+            return energy + potential.cutoff_correction(
+                box, particles.num_particles)
+        type_counts = np.bincount(types, minlength=potential.num_types)
+        return energy + potential.cutoff_correction(
+            box, particles.num_particles, type_counts)
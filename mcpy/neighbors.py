@@ -0,0 +1,636 @@
+"""
+neighbors.py
+Spatial decompositions of a periodic Box used to restrict distance queries
+to particles within the potential cutoff.
+"""
+
+import numpy as np
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+
+def _squared_minimum_image(box, first, second):
+    # Separations are taken in float64 whatever the storage precision.
+    return np.sum(np.square(box.separations(first, second)), axis=1)
+
+
+class CellList:
+    """Linked-cell decomposition of a periodic Box.
+
+    The box is split into a grid of cells that are at least `cutoff` wide
+    along each lattice direction, so every particle within `cutoff` of a
+    given particle sits in the same or one of the 26 surrounding cells.
+
+    Parameters
+    ----------
+    box : Box
+        The periodic box to decompose.
+    cutoff : float
+        The interaction cutoff. Cells are at least this wide.
+
+    Returns
+    -------
+    self : CellList
+        Returns an instance of itself.
+
+    Attributes
+    ----------
+    box : Box
+        The periodic box the cells are laid out in.
+    cutoff : float
+        The interaction cutoff the cells were sized for.
+    cells_per_dim : np.array
+        Number of cells along x, y and z.
+    num_cells : int
+        Total number of cells.
+    neighbor_cells : np.array
+        Array of shape (num_cells, 27) with the indices of the cells adjacent
+        to each cell (itself included). Duplicate cells, which occur when
+        there are fewer than three cells along a dimension, are replaced by
+        the index `num_cells` of an always empty cell.
+    cell_particles : np.array
+        Array of shape (num_cells + 1, capacity) holding the particle indices
+        in each cell, padded with -1.
+    cell_counts : np.array
+        Number of particles in each cell.
+    particle_cell : np.array
+        Cell index of each particle.
+    particle_slot : np.array
+        Column of each particle in `cell_particles`.
+    capacity : int
+        Number of particles a cell was sized for at the last build.
+    num_crossings : int
+        Number of accepted moves that carried a particle into another cell.
+    """
+    def __init__(self, box, cutoff):
+        widths = box.widths
+        if np.any(cutoff > 0.5 * widths):
+            raise ValueError("Cell lists require a cutoff no larger than "
+                             "half the box width.")
+        self.box = box
+        self.cutoff = cutoff
+        self.cells_per_dim = np.maximum(
+            np.floor(widths / cutoff).astype(int), 1)
+        self.num_cells = int(np.prod(self.cells_per_dim))
+        self.neighbor_cells = self._build_neighbor_cells()
+        self.cell_particles = np.full((self.num_cells + 1, 1), -1, dtype=int)
+        self.cell_counts = np.zeros(self.num_cells + 1, dtype=int)
+        self.particle_cell = np.zeros(0, dtype=int)
+        self.particle_slot = np.zeros(0, dtype=int)
+        self.capacity = 1
+        self.num_crossings = 0
+
+    @property
+    def num_overfull(self):
+        """Number of cells holding more particles than `capacity`."""
+        return int(np.count_nonzero(self.cell_counts > self.capacity))
+
+    def _build_neighbor_cells(self):
+        nx, ny, nz = self.cells_per_dim
+        grid = np.stack(np.meshgrid(np.arange(nx), np.arange(ny),
+                                    np.arange(nz), indexing='ij'),
+                        axis=-1).reshape(-1, 1, 3)
+        shifts = np.stack(np.meshgrid([-1, 0, 1], [-1, 0, 1], [-1, 0, 1],
+                                      indexing='ij'),
+                          axis=-1).reshape(1, -1, 3)
+        adjacent = (grid + shifts) % self.cells_per_dim
+        neighbor_cells = np.sort(self._flatten(adjacent), axis=1)
+        duplicate = neighbor_cells[:, 1:] == neighbor_cells[:, :-1]
+        neighbor_cells[:, 1:][duplicate] = self.num_cells
+        return neighbor_cells
+
+    def _flatten(self, cell_xyz):
+        ny, nz = self.cells_per_dim[1:]
+        return (cell_xyz[..., 0] * ny + cell_xyz[..., 1]) * nz + \
+            cell_xyz[..., 2]
+
+    def cell_index(self, coordinates):
+        """Find the cell each position belongs to.
+
+        Parameters
+        ----------
+        coordinates : np.array
+            A position of shape (3,) or an array of positions of shape (n, 3).
+            Positions need not be wrapped into the box.
+
+        Returns
+        -------
+        cell : int or np.array
+            The flat cell index of each position.
+        """
+        fractional = self.box.fractional(coordinates) + 0.5
+        fractional -= np.floor(fractional)
+        cell_xyz = np.minimum((fractional * self.cells_per_dim).astype(int),
+                              self.cells_per_dim - 1)
+        return self._flatten(cell_xyz)
+
+    def build(self, coordinates):
+        """Bin all particles into cells.
+
+        Parameters
+        ----------
+        coordinates : np.array
+            Array of the atomic xyz coordinate for all particles.
+
+        Returns
+        -------
+        None
+        """
+        num_particles = len(coordinates)
+        self.particle_cell = self.cell_index(coordinates)
+        self.cell_counts = np.bincount(self.particle_cell,
+                                       minlength=self.num_cells + 1)
+        # Leave room for a couple of arrivals so moves rarely grow the table.
+        self.capacity = int(self.cell_counts.max()) + 2
+        order = np.argsort(self.particle_cell, kind='stable')
+        starts = np.cumsum(self.cell_counts) - self.cell_counts
+        sorted_cells = self.particle_cell[order]
+        self.particle_slot = np.empty(num_particles, dtype=int)
+        self.particle_slot[order] = np.arange(num_particles) - \
+            starts[sorted_cells]
+        self.cell_particles = np.full((self.num_cells + 1, self.capacity),
+                                      -1, dtype=int)
+        self.cell_particles[self.particle_cell, self.particle_slot] = \
+            np.arange(num_particles)
+
+    def candidates(self, index, coordinates):
+        """Indices of the particles in the cells surrounding a particle.
+
+        Parameters
+        ----------
+        index : int
+            Index of the particle to find candidates for.
+        coordinates : np.array
+            Array of the atomic xyz coordinate for all particles. Only the
+            position of `index` may differ from the binned positions.
+
+        Returns
+        -------
+        candidates : np.array
+            Indices of the particles in the 27 surrounding cells, `index`
+            excluded.
+        """
+        cell = self.cell_index(coordinates[index])
+        candidates = self.cell_particles[self.neighbor_cells[cell]].ravel()
+        return candidates[(candidates >= 0) & (candidates != index)]
+
+    def query(self, index, coordinates):
+        """Squared minimum image distances to the particles in nearby cells.
+
+        Parameters
+        ----------
+        index : int
+            Index of the particle to take the minimum images for.
+        coordinates : np.array
+            Array of the atomic xyz coordinate for all particles. Only the
+            position of `index` may differ from the binned positions.
+
+        Returns
+        -------
+        indices : np.array
+            Indices of the candidate particles.
+        rij2 : np.array
+            Squared distances between particle `index` and each candidate.
+        """
+        indices = self.candidates(index, coordinates)
+        return indices, _squared_minimum_image(self.box, coordinates[index],
+                                               coordinates[indices])
+
+    def pairs(self, coordinates, cutoff=None):
+        """Find every unique pair of particles within a cutoff.
+
+        Only particles in adjacent cells are compared. The members of each
+        cell are enumerated from the particles sorted by cell, so the work
+        grows with the number of candidate pairs, not with the fullest cell.
+
+        Parameters
+        ----------
+        coordinates : np.array
+            Array of the atomic xyz coordinate for all particles, as binned.
+        cutoff : float, optional
+            The pair cutoff, defaults to the cell list cutoff. Must not exceed
+            it.
+
+        Returns
+        -------
+        i, j : np.array
+            Indices of the two particles of each pair, with i < j.
+        rij2 : np.array
+            Squared minimum image distance of each pair.
+        """
+        cutoff2 = np.square(self.cutoff if cutoff is None else cutoff)
+        num_particles = len(self.particle_cell)
+        # Particles sorted by cell, so each cell is a contiguous run.
+        order = np.argsort(self.particle_cell, kind='stable')
+        starts = np.cumsum(self.cell_counts) - self.cell_counts
+        particles = np.arange(num_particles)
+        found = []
+        for k in range(self.neighbor_cells.shape[1]):
+            # Every particle against the members of its k-th adjacent cell,
+            # only real members are enumerated, no padded slots.
+            other = self.neighbor_cells[self.particle_cell, k]
+            counts = self.cell_counts[other]
+            i = np.repeat(particles, counts)
+            first = np.cumsum(counts) - counts
+            position = np.arange(len(i)) - np.repeat(first, counts)
+            j = order[np.repeat(starts[other], counts) + position]
+            # j > i keeps each pair once.
+            upper = j > i
+            i, j = i[upper], j[upper]
+            rij2 = _squared_minimum_image(self.box, coordinates[i],
+                                          coordinates[j])
+            inside = rij2 < cutoff2
+            found.append((i[inside], j[inside], rij2[inside]))
+        return tuple(np.concatenate(arrays) for arrays in zip(*found))
+
+    def update(self, index, coordinates):
+        """Account for an accepted move of particle `index`.
+
+        Only the moved particle changes cell, so this takes constant time.
+        The last particle of the old cell takes over the vacated slot.
+
+        Parameters
+        ----------
+        index : int
+            Index of the particle that moved.
+        coordinates : np.array
+            Array of the atomic xyz coordinate for all particles.
+
+        Returns
+        -------
+        None
+        """
+        new_cell = self.cell_index(coordinates[index])
+        old_cell = self.particle_cell[index]
+        if new_cell == old_cell:
+            return
+        self.num_crossings += 1
+
+        slot = self.particle_slot[index]
+        last = self.cell_counts[old_cell] - 1
+        moved = self.cell_particles[old_cell, last]
+        self.cell_particles[old_cell, slot] = moved
+        self.particle_slot[moved] = slot
+        self.cell_particles[old_cell, last] = -1
+        self.cell_counts[old_cell] -= 1
+
+        count = self.cell_counts[new_cell]
+        if count == self.cell_particles.shape[1]:
+            extra = np.full((self.num_cells + 1, count // 4 + 1), -1,
+                            dtype=int)
+            self.cell_particles = np.hstack((self.cell_particles, extra))
+        self.cell_particles[new_cell, count] = index
+        self.particle_slot[index] = count
+        self.particle_cell[index] = new_cell
+        self.cell_counts[new_cell] += 1
+
+
+class VerletList:
+    """Verlet neighbor list with a skin and per-particle refreshes.
+
+    Each particle keeps the particles whose reference positions lie within
+    `cutoff + skin` of its own. Particles stay within half the skin of their
+    reference, so every pair inside the cutoff is listed. When an accepted
+    move carries a particle further, only its reference and partners are
+    refreshed, from a cell list binned at the reference positions, instead
+    of rebuilding the whole list.
+
+    Parameters
+    ----------
+    box : Box
+        The periodic box the particles live in.
+    cutoff : float
+        The interaction cutoff.
+    skin : float, optional, default : 0.3
+        Extra distance beyond the cutoff kept in the list.
+
+    Returns
+    -------
+    self : VerletList
+        Returns an instance of itself.
+
+    Attributes
+    ----------
+    box : Box
+        The periodic box the particles live in.
+    cutoff : float
+        The interaction cutoff.
+    skin : float
+        Extra distance beyond the cutoff kept in the list.
+    cell_list : CellList
+        Cell list of width `cutoff + skin`, binned at the reference
+        positions.
+    partner_table : np.array
+        Array of shape (n, capacity) holding the partners of each particle,
+        padded with -1.
+    partner_counts : np.array
+        Number of partners of each particle.
+    capacity : int
+        Number of partners a row was sized for at the last build.
+    reference : np.array
+        The position of each particle when its partners were last found.
+    num_builds : int
+        Number of times the whole list has been built.
+    num_refreshes : int
+        Number of accepted moves that refreshed the partners of a particle.
+    """
+    def __init__(self, box, cutoff, skin=0.3):
+        self.box = box
+        self.cutoff = cutoff
+        self.skin = skin
+        self.cell_list = CellList(box, cutoff + skin)
+        self.partner_table = np.full((0, 1), -1, dtype=int)
+        self.partner_counts = np.zeros(0, dtype=int)
+        self.capacity = 1
+        self.reference = np.zeros((0, 3))
+        self.num_builds = 0
+        self.num_refreshes = 0
+
+    def build(self, coordinates):
+        """Rebuild the neighbor list from the current coordinates.
+
+        Parameters
+        ----------
+        coordinates : np.array
+            Array of the atomic xyz coordinate for all particles.
+
+        Returns
+        -------
+        None
+        """
+        num_particles = len(coordinates)
+        self.cell_list.build(coordinates)
+        i, j, _ = self.cell_list.pairs(coordinates)
+        first = np.concatenate((i, j))
+        second = np.concatenate((j, i))
+        order = np.argsort(first, kind='stable')
+        first, second = first[order], second[order]
+        self.partner_counts = np.bincount(first, minlength=num_particles)
+        # Leave room for a couple of arrivals so refreshes rarely grow rows.
+        self.capacity = int(self.partner_counts.max(initial=0)) + 2
+        starts = np.cumsum(self.partner_counts) - self.partner_counts
+        self.partner_table = np.full((num_particles, self.capacity), -1,
+                                     dtype=int)
+        self.partner_table[first, np.arange(len(first)) - starts[first]] = \
+            second
+        self.reference = coordinates.copy()
+        self.num_builds += 1
+
+    def _moved_out(self, index, coordinates):
+        displacement = self.box.separations(coordinates[index],
+                                            self.reference[index])
+        return np.dot(displacement, displacement) > 0.25 * self.skin ** 2
+
+    def _grow(self, needed):
+        width = self.partner_table.shape[1]
+        if needed > width:
+            extra = np.full((len(self.partner_table),
+                             needed - width + needed // 4 + 1), -1,
+                            dtype=int)
+            self.partner_table = np.hstack((self.partner_table, extra))
+
+    def _refresh(self, index, coordinates):
+        """Find the partners of `index` anew around its current position."""
+        self.reference[index] = coordinates[index]
+        self.cell_list.update(index, self.reference)
+        candidates = self.cell_list.candidates(index, self.reference)
+        rij2 = _squared_minimum_image(self.box, self.reference[index],
+                                      self.reference[candidates])
+        new = candidates[rij2 < (self.cutoff + self.skin) ** 2]
+        old = self.partner_table[index, :self.partner_counts[index]]
+        lost = np.setdiff1d(old, new, assume_unique=True)
+        gained = np.setdiff1d(new, old, assume_unique=True)
+
+        # The last partner of each losing row takes over the vacated slot.
+        rows = self.partner_table[lost]
+        slot = np.argmax(rows == index, axis=1)
+        last = self.partner_counts[lost] - 1
+        self.partner_table[lost, slot] = rows[np.arange(len(lost)), last]
+        self.partner_table[lost, last] = -1
+        self.partner_counts[lost] -= 1
+
+        self._grow(max(len(new), self.partner_counts[gained].max(initial=0)
+                       + 1))
+        self.partner_table[gained, self.partner_counts[gained]] = index
+        self.partner_counts[gained] += 1
+        self.partner_table[index] = -1
+        self.partner_table[index, :len(new)] = new
+        self.partner_counts[index] = len(new)
+        self.num_refreshes += 1
+
+    def query(self, index, coordinates):
+        """Squared minimum image distances to the listed partners.
+
+        Parameters
+        ----------
+        index : int
+            Index of the particle to take the minimum images for.
+        coordinates : np.array
+            Array of the atomic xyz coordinate for all particles. Only the
+            position of `index` may differ from the accepted positions.
+
+        Returns
+        -------
+        indices : np.array
+            Indices of the partner particles.
+        rij2 : np.array
+            Squared distances between particle `index` and each partner.
+        """
+        if self._moved_out(index, coordinates):
+            # The trial position left the skin, but the cells are still
+            # wide enough to hold every partner within the cutoff.
+            return self.cell_list.query(index, coordinates)
+        indices = self.partner_table[index, :self.partner_counts[index]]
+        return indices, _squared_minimum_image(self.box, coordinates[index],
+                                               coordinates[indices])
+
+    def pairs(self, coordinates):
+        """Every unique listed pair with its current squared distance.
+
+        Parameters
+        ----------
+        coordinates : np.array
+            Array of the atomic xyz coordinate for all particles.
+
+        Returns
+        -------
+        i, j : np.array
+            Indices of the two particles of each pair, with i < j.
+        rij2 : np.array
+            Squared minimum image distance of each pair.
+        """
+        i = np.repeat(np.arange(len(self.partner_counts)),
+                      self.partner_counts)
+        j = self.partner_table[self.partner_table >= 0]
+        upper = j > i
+        i, j = i[upper], j[upper]
+        return i, j, _squared_minimum_image(self.box, coordinates[i],
+                                            coordinates[j])
+
+    def update(self, index, coordinates):
+        """Refresh the partners of `index` if its accepted move left the skin.
+
+        Only the moved particle and the rows of the partners it gains or
+        loses change, so the cost does not grow with the system size.
+
+        Parameters
+        ----------
+        index : int
+            Index of the particle that moved.
+        coordinates : np.array
+            Array of the atomic xyz coordinate for all particles.
+
+        Returns
+        -------
+        None
+        """
+        if self._moved_out(index, coordinates):
+            self._refresh(index, coordinates)
+
+
+class KDTreeNeighbors:
+    """Periodic KD-tree neighbor search for inhomogeneous systems.
+
+    Unlike cells, a tree adapts to the local density, so slabs and clusters
+    in large, mostly empty boxes cost neither memory for empty cells nor
+    long candidate lists in dense ones. The tree is built on the positions
+    at the last build and only rebuilt once an accepted move carries a
+    particle more than half the skin away from them. Requires SciPy and an
+    orthorhombic box.
+
+    Parameters
+    ----------
+    box : Box
+        The periodic box the particles live in.
+    cutoff : float
+        The interaction cutoff.
+    skin : float, optional, default : 0.3
+        Allowed drift of the particles before the tree is rebuilt.
+
+    Returns
+    -------
+    self : KDTreeNeighbors
+        Returns an instance of itself.
+
+    Attributes
+    ----------
+    box : Box
+        The periodic box the particles live in.
+    cutoff : float
+        The interaction cutoff.
+    skin : float
+        Allowed drift of the particles before the tree is rebuilt.
+    tree : scipy.spatial.cKDTree
+        The tree over the positions at the last build.
+    reference : np.array
+        The coordinates at the last build.
+    num_builds : int
+        Number of times the tree has been built.
+    """
+    def __init__(self, box, cutoff, skin=0.3):
+        if cKDTree is None:
+            raise ImportError("KDTreeNeighbors requires scipy.")
+        cell = box.cell
+        if np.any(cell != np.diag(np.diag(cell))):
+            raise ValueError("KDTreeNeighbors requires an orthorhombic box.")
+        if np.any(cutoff > 0.5 * box.widths):
+            raise ValueError("KDTreeNeighbors require a cutoff no larger "
+                             "than half the box width.")
+        self.box = box
+        self.cutoff = cutoff
+        self.skin = skin
+        self.tree = None
+        self.reference = np.zeros((0, 3))
+        self.num_builds = 0
+
+    def _in_tree_frame(self, coordinates):
+        # cKDTree wants periodic data in [0, box_dims).
+        box_dims = np.asarray(self.box.box_dims, dtype=float)
+        fractional = self.box.fractional(coordinates) + 0.5
+        shifted = (fractional - np.floor(fractional)) * box_dims
+        return np.where(shifted < box_dims, shifted, 0.0)
+
+    def build(self, coordinates):
+        """Build the tree from the current coordinates.
+
+        Parameters
+        ----------
+        coordinates : np.array
+            Array of the atomic xyz coordinate for all particles.
+
+        Returns
+        -------
+        None
+        """
+        self.tree = cKDTree(self._in_tree_frame(coordinates),
+                            boxsize=self.box.box_dims)
+        self.reference = coordinates.copy()
+        self.num_builds += 1
+
+    def query(self, index, coordinates):
+        """Squared minimum image distances to the particles near `index`.
+
+        Parameters
+        ----------
+        index : int
+            Index of the particle to take the minimum images for.
+        coordinates : np.array
+            Array of the atomic xyz coordinate for all particles. Only the
+            position of `index` may differ from the accepted positions.
+
+        Returns
+        -------
+        indices : np.array
+            Indices of the candidate particles.
+        rij2 : np.array
+            Squared distances between particle `index` and each candidate.
+        """
+        indices = np.array(self.tree.query_ball_point(
+            self._in_tree_frame(coordinates[index]),
+            self.cutoff + 0.5 * self.skin), dtype=int)
+        indices = indices[indices != index]
+        return indices, _squared_minimum_image(self.box, coordinates[index],
+                                               coordinates[indices])
+
+    def pairs(self, coordinates):
+        """Every unique pair that may lie within the cutoff.
+
+        Parameters
+        ----------
+        coordinates : np.array
+            Array of the atomic xyz coordinate for all particles.
+
+        Returns
+        -------
+        i, j : np.array
+            Indices of the two particles of each pair, with i < j.
+        rij2 : np.array
+            Squared minimum image distance of each pair.
+        """
+        found = self.tree.query_pairs(self.cutoff + self.skin,
+                                      output_type='ndarray')
+        i, j = found[:, 0], found[:, 1]
+        return i, j, _squared_minimum_image(self.box, coordinates[i],
+                                            coordinates[j])
+
+    def update(self, index, coordinates):
+        """Rebuild the tree if the accepted move of `index` left the skin.
+
+        Parameters
+        ----------
+        index : int
+            Index of the particle that moved.
+        coordinates : np.array
+            Array of the atomic xyz coordinate for all particles.
+
+        Returns
+        -------
+        None
+        """
+        displacement = self.box.separations(coordinates[index],
+                                            self.reference[index])
+        if np.dot(displacement, displacement) > 0.25 * self.skin ** 2:
+            self.build(coordinates)
@@ -18,6 +18,13 @@ class PairwisePotential(ABC):
         + Square-well
 
     """
+    # Number of particle types the potential holds parameters for.
+    num_types = 1
+    # Whether the energy is either zero or infinite, as for hard spheres.
+    hard = False
+    # Per-particle contact counts, for potentials that track them.
+    contacts = None
+
     @abstractmethod
     def potential(self, rij2):
         pass
@@ -26,28 +33,75 @@ class PairwisePotential(ABC):
     def __call__(self, rij2):
         pass
 
+    def force_factor(self, rij2):
+        """Pair force divided by the distance, -dU/dr / r.
+
+        Multiplying by the separation vector r_i - r_j gives the force on
+        particle i. Potentials without analytic forces do not override this.
+        """
+        raise NotImplementedError(
+            "{} has no analytic forces.".format(type(self).__name__))
+
 class LJ(PairwisePotential):
     """Pairwise potential and correction energy by Lennard-Jones potential
 
     Parameters
     ----------
 
-    sigma : float
-        Distance between two particles when interaction potential is zero
+    sigma : float or np.array
+        Distance between two particles when interaction potential is zero.
+        One value per particle type, or an (ntype, ntype) table.
+
+    epsilon: float or np.array
+        Depth of potential well. One value per particle type, or an
+        (ntype, ntype) table.
+
+    cutoff : float or np.array
+        Distance beyond which pairs do not interact, a scalar or an
+        (ntype, ntype) table.
 
-    epsilon: float
-        Depth of potential well
+    mixing : str
+        How per-type sigma and epsilon are combined for unlike pairs,
+        'lorentz-berthelot' (arithmetic sigma, geometric epsilon) or
+        'geometric'. Tables are used as given.
 
     """
     
-    def __init__(self, sigma=1.0, epsilon=1.0, cutoff=2.6):
+    def __init__(self, sigma=1.0, epsilon=1.0, cutoff=2.6,
+                 mixing='lorentz-berthelot'):
 
         self.sigma = sigma
         self.epsilon = epsilon
-        self._cutoff = cutoff
-        self.cutoff2 = cutoff * cutoff
-    
-    def potential(self, rij2):
+        sigma_table = _pair_table(sigma, mixing, arithmetic=True)
+        epsilon_table = _pair_table(epsilon, mixing, arithmetic=False)
+        self.num_types = max(len(sigma_table), len(epsilon_table),
+                             np.ndim(cutoff) and len(cutoff))
+        shape = (self.num_types, self.num_types)
+        self.sigma2_table = np.broadcast_to(np.square(sigma_table),
+                                            shape).copy()
+        self.epsilon_table = np.broadcast_to(epsilon_table, shape).copy()
+        self.cutoff2_table = np.broadcast_to(np.square(cutoff), shape).copy()
+        self._cutoff = np.sqrt(self.cutoff2_table.max())
+        self.cutoff2 = self._cutoff * self._cutoff
+        # Constants of the untyped kernel, fixed at construction.
+        self._sigma2 = float(self.sigma2_table[0, 0])
+        self._epsilon4 = 4.0 * float(self.epsilon_table[0, 0])
+        self._buffers = np.empty((2, 0))
+        self._inside = np.empty(0, dtype=bool)
+
+    @property
+    def cutoff(self):
+        """Distance beyond which pairs do not interact."""
+        return self._cutoff
+
+    def _parameters(self, types_i, types_j):
+        """Gathers sigma^2, epsilon and cutoff^2 of each pair of types."""
+        pair = np.asarray(types_i) * self.num_types + np.asarray(types_j)
+        return (self.sigma2_table.ravel()[pair],
+                self.epsilon_table.ravel()[pair],
+                self.cutoff2_table.ravel()[pair])
+
+    def potential(self, rij2, types_i=None, types_j=None):
         """Pairwiswe potential energy by Lennard-Jones potential
 
     Parameters
@@ -56,14 +110,49 @@ class LJ(PairwisePotential):
     rij2 : np.array
         square distance between two particles
 
+    types_i, types_j : int or np.array, optional
+        particle types of the two particles, broadcast against rij2
+
     """
 
-        sigma2 = np.power(self.sigma,2)
+        if types_i is None:
+            sig_by_r2 = self._sigma2 / rij2
+            sig_by_r6 = sig_by_r2 * sig_by_r2 * sig_by_r2
+            return self._epsilon4 * sig_by_r6 * (sig_by_r6 - 1.0)
+        sigma2, epsilon, _ = self._parameters(types_i, types_j)
         sig_by_r6 = np.power(sigma2/rij2,3)
         sig_by_r12 = np.power(sig_by_r6,2)
-        return 4.0*self.epsilon*(sig_by_r12-sig_by_r6)
+        return 4.0*epsilon*(sig_by_r12-sig_by_r6)
+
+    def force_factor(self, rij2, types_i=0, types_j=0):
+        """Lennard-Jones pair force divided by the distance
+
+    Zero for pairs at or beyond the cutoff.
+
+    Parameters
+    ----------
+
+    rij2 : np.array
+        square distance between two particles
+
+    types_i, types_j : int or np.array, optional
+        particle types of the two particles, broadcast against rij2
+
+    Return
+    ------
+
+    f_by_r : np.array
+        -dU/dr / r for every pair
 
-    def cutoff_correction(self, box_object, num_particles,):
+    """
+
+        rij2 = np.asarray(rij2, dtype=float)
+        sigma2, epsilon, cutoff2 = self._parameters(types_i, types_j)
+        sig_by_r6 = np.power(sigma2 / rij2, 3)
+        f_by_r = 24.0 * epsilon * (2.0 * sig_by_r6 - 1.0) * sig_by_r6 / rij2
+        return np.where(rij2 < cutoff2, f_by_r, 0.0)
+
+    def cutoff_correction(self, box_object, num_particles, type_counts=None):
         """The function corrects interaction energy from energy cutoff.
 
     Parameters
@@ -75,52 +164,458 @@ class LJ(PairwisePotential):
     num_particles : float
         Total number of particles in the box
 
+    type_counts : np.array, optional
+        Number of particles of each type, all particles are of type 0 if
+        not given
+
     Return
     ------
 
     e_correction : float
-        Correction energy from truncation
+        Correction energy from truncation, summed over pairs of types
 
     """
 
+        if type_counts is None:
+            type_counts = np.zeros(self.num_types)
+            type_counts[0] = num_particles
         volume = box_object.volume
-        sig_by_cutoff3 = np.power(self.sigma/self._cutoff, 3)
+        sigma3 = np.power(self.sigma2_table, 1.5)
+        sig_by_cutoff3 = np.power(self.sigma2_table / self.cutoff2_table, 1.5)
         sig_by_cutoff9 = np.power(sig_by_cutoff3, 3)
         e_correction = sig_by_cutoff9 - 3.0 * sig_by_cutoff3
-        e_correction *= 8.0 / 9.0 * np.pi * np.power(num_particles,2) * self.epsilon * np.power(self.sigma,3)/ volume
-        return e_correction
+        e_correction *= 8.0 / 9.0 * np.pi * self.epsilon_table * sigma3 / volume
+        counts = np.asarray(type_counts, dtype=float)
+        return counts @ e_correction @ counts
+
+    def __call__(self, rij2, types_i=None, types_j=None):
+
+        if types_i is not None:
+            rij2 = np.asarray(rij2)
+            pair = np.broadcast_to(
+                np.asarray(types_i) * self.num_types + np.asarray(types_j),
+                rij2.shape)
+            inside = rij2 < self.cutoff2_table.ravel()[pair]
+            pair = pair[inside]
+            return np.sum(self.potential(rij2[inside],
+                                         pair // self.num_types,
+                                         pair % self.num_types))
+        if not isinstance(rij2, np.ndarray) or rij2.ndim == 0:
+            if rij2 < self.cutoff2:
+                return float(self.potential(rij2))
+            return 0.0
+        return self._energy_sum(rij2.ravel())
+
+    def _energy_sum(self, rij2):
+        """Fused single-species kernel working in reusable buffers."""
+        num_pairs = len(rij2)
+        if self._buffers.shape[1] < num_pairs:
+            self._buffers = np.empty((2, num_pairs))
+            self._inside = np.empty(num_pairs, dtype=bool)
+        inside = self._inside[:num_pairs]
+        np.less(rij2, self.cutoff2, out=inside)
+        if num_pairs > _COMPACT_SIZE:
+            # Long arrays are mostly beyond the cutoff, so only the pairs
+            # inside are copied into the buffer and evaluated.
+            num_inside = np.count_nonzero(inside)
+            s6, u = self._buffers[:, :num_inside]
+            np.compress(inside, rij2, out=s6)
+            np.divide(self._sigma2, s6, out=s6)
+        else:
+            s6, u = self._buffers[:, :num_pairs]
+            np.divide(self._sigma2, rij2, out=s6)
+        np.multiply(s6, s6, out=u)
+        np.multiply(u, s6, out=s6)
+        np.subtract(s6, 1.0, out=u)
+        if num_pairs > _COMPACT_SIZE:
+            return self._epsilon4 * np.dot(s6, u)
+        np.multiply(u, s6, out=u)
+        # Masked reduction, pairs beyond the cutoff weigh zero.
+        return self._epsilon4 * np.dot(u, inside)
+
+
+# Above this many distances the LJ kernel evaluates only the pairs inside
+# the cutoff instead of masking the sum.
+_COMPACT_SIZE = 1024
+
+
+def _pair_table(values, mixing, arithmetic):
+    """Expands per-type values to an (ntype, ntype) table of pair values."""
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 2:
+        return values
+    values = np.atleast_1d(values)
+    if mixing == 'lorentz-berthelot' and arithmetic:
+        return 0.5 * (values[:, np.newaxis] + values[np.newaxis, :])
+    if mixing in ('lorentz-berthelot', 'geometric'):
+        return np.sqrt(values[:, np.newaxis] * values[np.newaxis, :])
+    raise ValueError("Unknown mixing rule {!r}.".format(mixing))
+
+class Tabulated(PairwisePotential):
+    """Pairwise potential interpolated from a table on a grid in r^2
+
+    Any pair energy function, such as the `potential` method of another
+    PairwisePotential or a user callable for Morse or Yukawa interactions,
+    is sampled once on a uniform grid in squared distance between `r_min`
+    and the cutoff. Evaluation is a table lookup plus linear or cubic
+    Hermite interpolation, so it costs the same whatever the function.
 
-    def __call__(self, rij2):
+    Parameters
+    ----------
 
-        try:
-            e_pair = np.sum(self.potential(rij2[rij2 < self.cutoff2]))
-        except TypeError:
-            if rij2 < self.cutoff2:
-                e_pair = self.potential(rij2)
-            else:
-                e_pair = 0.0
+    function : callable or PairwisePotential
+        Maps an array of squared distances to pair energies. For a
+        PairwisePotential its `potential` method is sampled.
+
+    cutoff : float, optional
+        Distance beyond which pairs do not interact, defaults to the cutoff
+        of `function` if it has one.
+
+    r_min : float, optional
+        Smallest tabulated distance. Closer pairs are passed to `function`
+        directly.
+
+    num_points : int, optional
+        Number of grid points. Doubled until the interpolation error is
+        below `tolerance` if that is given.
+
+    kind : str, optional
+        'linear' or 'cubic' interpolation.
+
+    tolerance : float, optional
+        Largest acceptable absolute interpolation error.
+
+    tail : bool, optional
+        If true the energy beyond the cutoff is integrated numerically for
+        `cutoff_correction`.
+
+    Attributes
+    ----------
+
+    error : float
+        Largest absolute interpolation error found between grid points.
+
+    tail_integral : float
+        Integral of r^2 u(r) from the cutoff to infinity.
+
+    """
+
+    def __init__(self, function, cutoff=None, r_min=0.5, num_points=1000,
+                 kind='cubic', tolerance=None, tail=True):
+
+        if kind not in ('linear', 'cubic'):
+            raise ValueError("Unknown interpolation {!r}, expected 'linear' "
+                             "or 'cubic'.".format(kind))
+        if isinstance(function, PairwisePotential):
+            if cutoff is None:
+                cutoff = function.cutoff
+            function = function.potential
+        if cutoff is None:
+            raise ValueError("A cutoff is required.")
+        self.function = function
+        self.kind = kind
+        self._cutoff = cutoff
+        self.cutoff2 = cutoff * cutoff
+        self.r2_min = r_min * r_min
+        self._x = np.empty(0)
+        self._t = np.empty(0)
+        self._inside = np.empty(0, dtype=bool)
+        self._tabulate(num_points)
+        while tolerance is not None and self.error > tolerance:
+            if self.num_points > 2**22:
+                raise ValueError("Tolerance {} not reached with {} points."
+                                 .format(tolerance, self.num_points))
+            self._tabulate(2 * self.num_points - 1)
+        self.tail_integral = self._tail_integral() if tail else 0.0
+
+    @property
+    def cutoff(self):
+        """Distance beyond which pairs do not interact."""
+        return self._cutoff
+
+    def _tabulate(self, num_points):
+        self.num_points = num_points
+        grid, self.dr2 = np.linspace(self.r2_min, self.cutoff2, num_points,
+                                     retstep=True)
+        self.inv_dr2 = 1.0 / self.dr2
+        values = self.function(grid)
+        if self.kind == 'linear':
+            self.coefficients = np.stack([values[:-1], np.diff(values)])
+        else:
+            # Cubic Hermite polynomials in the position t within each
+            # interval, with slopes from a fine central difference.
+            step = 1e-3 * self.dr2
+            slopes = (self.function(grid + step) -
+                      self.function(grid - step)) / (2.0 * step) * self.dr2
+            v0, v1 = values[:-1], values[1:]
+            m0, m1 = slopes[:-1], slopes[1:]
+            self.coefficients = np.stack([v0, m0,
+                                          3.0 * (v1 - v0) - 2.0 * m0 - m1,
+                                          2.0 * (v0 - v1) + m0 + m1])
+        # A copy of the last interval catches rounding at the cutoff.
+        self.coefficients = np.concatenate(
+            [self.coefficients, self.coefficients[:, -1:]], axis=1)
+        midpoints = grid[:-1] + 0.5 * self.dr2
+        self.error = np.max(np.abs(self._interpolate(midpoints) -
+                                   self.function(midpoints)))
+
+    def _interpolate(self, rij2):
+        x = (rij2 - self.r2_min) * self.inv_dr2
+        k = x.astype(np.intp)
+        t = x - k
+        c = self.coefficients[:, k]
+        e_pair = c[-1]
+        for order in range(len(c) - 2, -1, -1):
+            e_pair = e_pair * t + c[order]
         return e_pair
 
+    def _tail_integral(self):
+        # With x = cutoff / r the integral runs over (0, 1] and stays smooth
+        # for energies decaying faster than r^-3.
+        x, weights = np.polynomial.legendre.leggauss(64)
+        x = 0.5 * (x + 1.0)
+        r2 = self.cutoff2 / (x * x)
+        return 0.5 * self._cutoff**3 * np.sum(weights * self.function(r2)
+                                              / x**4)
+
+    def potential(self, rij2):
+        """Interpolated pair energies, zero beyond the cutoff
+
+    Parameters
+    ----------
+
+    rij2 : np.array
+        square distance between two particles
+
+    """
+
+        rij2 = np.asarray(rij2, dtype=float)
+        e_pair = np.zeros(rij2.shape)
+        inside = (rij2 >= self.r2_min) & (rij2 < self.cutoff2)
+        e_pair[inside] = self._interpolate(rij2[inside])
+        close = rij2 < self.r2_min
+        if np.any(close):
+            e_pair[close] = self.function(rij2[close])
+        return e_pair
+
+    def force_factor(self, rij2):
+        """Pair force divided by the distance from the interpolant
+
+    Uses -dU/dr / r = -2 dU/d(r^2), zero beyond the cutoff.
+
+    Parameters
+    ----------
+
+    rij2 : np.array
+        square distance between two particles
+
+    """
+
+        rij2 = np.asarray(rij2, dtype=float)
+        f_by_r = np.zeros(rij2.shape)
+        inside = (rij2 >= self.r2_min) & (rij2 < self.cutoff2)
+        x = (rij2[inside] - self.r2_min) * self.inv_dr2
+        k = x.astype(np.intp)
+        t = x - k
+        c = self.coefficients[:, k]
+        slope = c[-1] * (len(c) - 1)
+        for order in range(len(c) - 2, 0, -1):
+            slope = slope * t + c[order] * order
+        f_by_r[inside] = -2.0 * self.inv_dr2 * slope
+        close = rij2 < self.r2_min
+        if np.any(close):
+            step = 1e-6 * rij2[close]
+            f_by_r[close] = -(self.function(rij2[close] + step) -
+                              self.function(rij2[close] - step)) / step
+        return f_by_r
+
+    def cutoff_correction(self, box_object, num_particles):
+        """Tail correction from the numerically integrated energy
+
+    Parameters
+    ----------
+
+    box_object : box
+        This is a box object.
+
+    num_particles : float
+        Total number of particles in the box
+
+    Return
+    ------
+
+    e_correction : float
+        Correction energy from truncation
+
+    """
+
+        return 2.0 * np.pi * num_particles**2 * self.tail_integral / \
+            box_object.volume
+
+    def __call__(self, rij2):
+
+        if not isinstance(rij2, np.ndarray) or rij2.ndim == 0:
+            return float(self.potential(rij2))
+        rij2 = rij2.ravel()
+        num_pairs = len(rij2)
+        if len(self._inside) < num_pairs:
+            self._x = np.empty(num_pairs)
+            self._t = np.empty(num_pairs)
+            self._inside = np.empty(num_pairs, dtype=bool)
+        inside = self._inside[:num_pairs]
+        np.less(rij2, self.cutoff2, out=inside)
+        num_inside = np.count_nonzero(inside)
+        x = np.compress(inside, rij2, out=self._x[:num_inside])
+        if num_inside and np.minimum.reduce(x) < self.r2_min:
+            return float(np.add.reduce(self.potential(x)))
+        # Grid interval k and position t within it.
+        np.subtract(x, self.r2_min, out=x)
+        np.multiply(x, self.inv_dr2, out=x)
+        k = x.astype(np.intp)
+        t = np.subtract(x, k, out=self._t[:num_inside])
+        coefficients = self.coefficients
+        e_pair = np.multiply(coefficients[-1][k], t, out=x)
+        for order in range(len(coefficients) - 2, 0, -1):
+            np.add(e_pair, coefficients[order][k], out=e_pair)
+            np.multiply(e_pair, t, out=e_pair)
+        np.add(e_pair, coefficients[0][k], out=e_pair)
+        return float(np.add.reduce(e_pair))
+
+
 class HS(PairwisePotential):
     """Pairwiswe potential energy by Hard-sphere potential
 
+    The energy is +inf for overlapping pairs, closer than sigma, and zero
+    otherwise. Summing an array of distances is a pure overlap test that
+    stops at the first overlapping chunk, no pair energies are computed.
+
+    Parameters
+    ----------
+
+    sigma : float or np.array
+        Hard-sphere diameter. One value per particle type, mixed
+        arithmetically, or an (ntype, ntype) table.
+
+    """
+
+    # The energy of an allowed configuration is always zero, so a trial
+    # move only needs to test the new position for overlaps.
+    hard = True
+
+    def __init__(self, sigma=1.0):
+
+        self.sigma = sigma
+        sigma_table = _pair_table(sigma, 'lorentz-berthelot', arithmetic=True)
+        self.num_types = len(sigma_table)
+        self.sigma2_table = np.square(sigma_table)
+        self._cutoff = np.sqrt(self.sigma2_table.max())
+        self.cutoff2 = self._cutoff * self._cutoff
+        self._sigma2 = float(self.sigma2_table[0, 0])
+
+    @property
+    def cutoff(self):
+        """Distance beyond which pairs do not interact, the largest sigma."""
+        return self._cutoff
+
+    def _sigma2_of(self, types_i, types_j):
+        pair = np.asarray(types_i) * self.num_types + np.asarray(types_j)
+        return self.sigma2_table.ravel()[pair]
+
+    def potential(self, rij2, types_i=None, types_j=None):
+        """Pairwiswe potential energy by Hard-sphere potential
+
     Parameters
     ----------
 
     rij2 : np.array
         square distance between two particles
 
+    types_i, types_j : int or np.array, optional
+        particle types of the two particles, broadcast against rij2
+
     """
 
-    def potential(self, rij2):
-        pass
+        if types_i is None:
+            sigma2 = self._sigma2
+        else:
+            sigma2 = self._sigma2_of(types_i, types_j)
+        return np.where(np.asarray(rij2) < sigma2, np.inf, 0.0)
 
-    def __call__(self, rij2):
-        pass
+    def cutoff_correction(self, box_object, num_particles, type_counts=None):
+        """Hard spheres do not interact beyond contact, no correction."""
+
+        return 0.0
+
+    def __call__(self, rij2, types_i=None, types_j=None):
+
+        if types_i is not None:
+            overlap = np.any(np.asarray(rij2) <
+                             self._sigma2_of(types_i, types_j))
+            return np.inf if overlap else 0.0
+        if not isinstance(rij2, np.ndarray) or rij2.ndim == 0:
+            return np.inf if rij2 < self._sigma2 else 0.0
+        rij2 = rij2.ravel()
+        for start in range(0, len(rij2), _OVERLAP_CHUNK):
+            if (rij2[start:start + _OVERLAP_CHUNK] < self._sigma2).any():
+                return np.inf
+        return 0.0
+
+
+# Distances are tested for overlaps in chunks of this size, so a large
+# candidate array is abandoned soon after the first overlap.
+_OVERLAP_CHUNK = 4096
 
 class SW(PairwisePotential):
     """Pairwiswe potential energy by Square-well potential
 
+    Pairs closer than sigma overlap and have infinite energy, pairs closer
+    than well_range * sigma are in contact and contribute -epsilon each.
+    Energies are therefore -epsilon times a number of contacts, which is
+    counted by comparing squared distances without any power terms.
+
+    Parameters
+    ----------
+
+    sigma : float
+        Hard-core diameter.
+
+    epsilon : float
+        Depth of the well.
+
+    well_range : float
+        Outer edge of the well in units of sigma, often called lambda.
+
+    Attributes
+    ----------
+
+    contacts : np.array or None
+        Number of contacts of every particle, only kept after
+        `track_contacts` has been called.
+
+    num_contacts : int
+        Total number of contacting pairs while contacts are tracked.
+
+    """
+
+    def __init__(self, sigma=1.0, epsilon=1.0, well_range=1.5):
+
+        self.sigma = sigma
+        self.epsilon = epsilon
+        self.well_range = well_range
+        self._sigma2 = float(sigma) ** 2
+        self._cutoff = float(well_range) * float(sigma)
+        self.cutoff2 = self._cutoff * self._cutoff
+        self.contacts = None
+        self.num_contacts = 0
+
+    @property
+    def cutoff(self):
+        """Distance beyond which pairs do not interact, the well edge."""
+        return self._cutoff
+
+    def potential(self, rij2):
+        """Pairwiswe potential energy by Square-well potential
+
     Parameters
     ----------
 
@@ -129,9 +624,122 @@ class SW(PairwisePotential):
 
     """
 
-    def potential(self, rij2):
-        pass
+        rij2 = np.asarray(rij2)
+        return np.where(rij2 < self._sigma2, np.inf,
+                        np.where(rij2 < self.cutoff2, -self.epsilon, 0.0))
+
+    def count(self, rij2):
+        """Number of squared distances inside the well, overlaps included."""
+
+        return int(np.count_nonzero(np.asarray(rij2) < self.cutoff2))
+
+    def partners(self, indices, rij2):
+        """Contacting partners of a particle, None if one overlaps it.
+
+    Parameters
+    ----------
+
+    indices : np.array or None
+        The partner of each distance, as returned by
+        `Box.particle_partners`. None when there is one distance per
+        particle in order.
+
+    rij2 : np.array
+        squared distances to the partners
+
+    Return
+    ------
+
+    contacts : np.array or None
+        Indices of the particles inside the well
+
+    """
+
+        if (rij2 < self._sigma2).any():
+            return None
+        in_well = np.flatnonzero(rij2 < self.cutoff2)
+        return in_well if indices is None else indices[in_well]
+
+    def cutoff_correction(self, box_object, num_particles, type_counts=None):
+        """The well is finite ranged, no correction."""
+
+        return 0.0
+
+    def track_contacts(self, box_object, coordinates, block_size=256):
+        """Count the contacts of every particle, to be updated incrementally.
+
+    Once tracked, the integrator keeps `contacts` and `num_contacts` up to
+    date on every accepted move and MCSimulation takes the energy from the
+    integer contact count, so it does not drift over long runs.
+
+    Parameters
+    ----------
+
+    box_object : box
+        This is a box object, its cutoff may not exceed half the width.
+
+    coordinates : np.array
+        Array of the atomic xyz coordinate for all particles, which may
+        not overlap.
+
+    block_size : int
+        Number of particles whose distances are taken at once.
+
+    Return
+    ------
+
+    contacts : np.array
+        Number of contacts of every particle
+
+    """
+
+        if self.cutoff > 0.5 * np.min(box_object.widths):
+            raise ValueError("Contacts are only tracked for minimum images, "
+                             "the well may not exceed half the box width.")
+        num_particles = len(coordinates)
+        contacts = np.zeros(num_particles, dtype=np.int64)
+        for start in range(0, num_particles, block_size):
+            rows = np.arange(start, min(start + block_size, num_particles))
+            rij2 = box_object.distance_block(coordinates, indices=rows)
+            rij2[np.arange(len(rows)), rows] = np.inf
+            if (rij2 < self._sigma2).any():
+                raise ValueError("Cannot track contacts of overlapping "
+                                 "particles.")
+            contacts[rows] = np.count_nonzero(rij2 < self.cutoff2, axis=1)
+        self.contacts = contacts
+        self.num_contacts = int(contacts.sum()) // 2
+        return contacts
+
+    def move_contacts(self, index, old_partners, new_partners):
+        """Update the tracked contacts for an accepted move of one particle.
+
+    Parameters
+    ----------
+
+    index : int
+        The particle that moved.
+
+    old_partners, new_partners : np.array
+        Contacting partners before and after the move, from `partners`.
+
+    """
+
+        self.contacts[old_partners] -= 1
+        self.contacts[new_partners] += 1
+        self.contacts[index] = len(new_partners)
+        self.num_contacts += len(new_partners) - len(old_partners)
+
+    def contact_energy(self):
+        """Total energy of the tracked contacts."""
+
+        return -self.epsilon * self.num_contacts
 
     def __call__(self, rij2):
-        pass
 
+        if not isinstance(rij2, np.ndarray) or rij2.ndim == 0:
+            if rij2 < self._sigma2:
+                return np.inf
+            return -self.epsilon if rij2 < self.cutoff2 else 0.0
+        if (rij2 < self._sigma2).any():
+            return np.inf
+        return -self.epsilon * self.count(rij2)
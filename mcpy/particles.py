@@ -5,8 +5,20 @@ Contains Particles class
 """
 
 import numpy as np
+import mcpy.xyz
 from mcpy.box import *
 
+# Sites of each lattice in fractional coordinates of its cubic unit cell.
+LATTICE_BASES = {
+    'sc': np.array([[0.0, 0.0, 0.0]]),
+    'bcc': np.array([[0.0, 0.0, 0.0],
+                     [0.5, 0.5, 0.5]]),
+    'fcc': np.array([[0.0, 0.0, 0.0],
+                     [0.0, 0.5, 0.5],
+                     [0.5, 0.0, 0.5],
+                     [0.5, 0.5, 0.0]]),
+}
+
 class Particles():
     '''Holds all the information of the particles.
 
@@ -15,6 +27,11 @@ class Particles():
     coordinates : np.array
         The numpy.array that holds the coordinates of particles with the 
         shape (n, 3), where n is the number of particles.
+    dtype : np.dtype, optional, default : np.float64
+        Storage precision of the coordinates, np.float32 or np.float64.
+        Distances and energies are accumulated in float64 either way.
+    types : np.array, optional
+        Integer species of each particle, all 0 by default.
 
     Returns
     -------
@@ -25,42 +42,87 @@ class Particles():
     ----------
     coordinates : np.array
         The numpy.array that holds the coordinates of particles with the
-        shape (n, 3), where n is the number of particles.
+        shape (n, 3), where n is the number of particles. Always a C
+        contiguous array of `dtype`; assigned arrays are converted.
+    dtype : np.dtype
+        Storage precision of the coordinates.
+    ids : np.array
+        The original index of each particle, which follows the particle when
+        the arrays are reordered.
+    types : np.array
+        Integer species of each particle, used to look up pair parameters.
+    groups : dict
+        Named `ParticleGroup` objects, kept up to date by `reorder`.
     '''
-    def __init__(self, coordinates):
+    # Arrays with one entry per particle, permuted together by `reorder`.
+    _per_particle = ('coordinates', 'ids', 'types')
+    # Storage types the coordinates may use.
+    _dtypes = (np.float32, np.float64)
+
+    def __init__(self, coordinates, dtype=np.float64, types=None):
         ''' Particles Class Constructor.
 
         Parameters:
         -----------
             coordinates : np.array
                 Array of shape (n, 3) where n is the number of particles.
+            dtype : np.dtype, optional
+                Storage precision, np.float32 or np.float64.
+            types : np.array, optional
+                Array of shape (n,) of integer particle types.
         '''
-        self.coordinates = coordinates
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in self._dtypes:
+            raise ValueError("Coordinates must be stored as one of {}."
+                             .format([np.dtype(t).name for t in self._dtypes]))
+        # Own the buffer, trial moves displace particles in place.
+        self.coordinates = np.array(coordinates, order='C')
+        self.ids = np.arange(len(coordinates))
+        if types is None:
+            types = np.zeros(len(coordinates), dtype=int)
+        self.types = np.asarray(types, dtype=int)
+        if self.types.shape != (len(coordinates),):
+            raise ValueError("Expected one type per particle.")
+        self.groups = {}
+
+    @property
+    def coordinates(self):
+        return self._coordinates
+
+    @coordinates.setter
+    def coordinates(self, coordinates):
+        self._coordinates = np.ascontiguousarray(coordinates,
+                                                 dtype=self.dtype)
 
 
     def __str__(self):
         return( F'Particles Object: {self._num_particles} particles.' )
 
     @classmethod
-    def from_file(cls, file_name):
+    def from_file(cls, file_name, dtype=np.float64, frame=0):
         ''' Class method: generates particles from file.
 
         Parameters:
         -----------
             file_name : str
-                A string with the path to the file with x, y, z coordinates.
+                A string with the path to the XYZ file, optionally gzipped
+                and holding several frames.
+            dtype : np.dtype, optional
+                Storage precision, np.float32 or np.float64.
+            frame : int, optional
+                The frame to read, negative values count from the end.
         Returns:
         --------
             particles : Particles class object
                 Particles class object.
         '''
-        coordinates = np.loadtxt(file_name, 
-            skiprows=2, usecols=(1, 2, 3))
-        particles = cls(coordinates)
+        coordinates = mcpy.xyz.read_frame(file_name, frame=frame,
+                                          dtype=dtype)
+        particles = cls(coordinates, dtype=dtype)
         return ( particles )
 
     @classmethod
-    def from_random(cls, num_particles, box_dims):
+    def from_random(cls, num_particles, box_dims, dtype=np.float64):
         ''' Class method: generates particles from file.
 
         Parameters:
@@ -69,6 +131,8 @@ class Particles():
                 Number of particles of the system to generate ramdomly if file_name is not given.
             box_dims : np.array
                 Array of shape (3,) of x, y, z dimensions.
+            dtype : np.dtype, optional
+                Storage precision, np.float32 or np.float64.
         
         Returns:
         --------
@@ -76,10 +140,422 @@ class Particles():
                 Particles class object.
         '''
         coordinates = (0.5 - np.random.rand(num_particles, 3)) * box_dims[np.newaxis,:]
-        particles = cls(coordinates)
+        particles = cls(coordinates, dtype=dtype)
+        return ( particles )
+
+    @classmethod
+    def from_lattice(cls, box, density=None, num_particles=None,
+                     lattice='fcc', jitter=0.0, dtype=np.float64):
+        ''' Class method: generates particles on a crystal lattice.
+
+        The box is tiled with unit cells whose size follows from the
+        density, so the nearest neighbor distance is as large as the
+        density allows. If the lattice has more sites than particles,
+        randomly chosen sites are left empty.
+
+        Parameters:
+        -----------
+            box : Box class object
+                The box to fill, orthorhombic or triclinic.
+            density : float, optional
+                Number density of the lattice. Defaults to
+                num_particles / box.volume.
+            num_particles : int, optional
+                Exact number of particles. Defaults to the number of
+                particles that fits the box at `density`.
+            lattice : str, optional
+                One of 'fcc', 'bcc' or 'sc'.
+            jitter : float, optional
+                Each coordinate is displaced by a uniform random amount in
+                [-jitter, jitter].
+            dtype : np.dtype, optional
+                Storage precision, np.float32 or np.float64.
+
+        Returns:
+        --------
+            particles : Particles class object
+                Particles class object.
+        '''
+        if lattice not in LATTICE_BASES:
+            raise ValueError("Unknown lattice {!r}, expected one of {}."
+                             .format(lattice, sorted(LATTICE_BASES)))
+        if density is None and num_particles is None:
+            raise ValueError("Either density or num_particles is required.")
+        if density is None:
+            density = num_particles / box.volume
+        if num_particles is None:
+            num_particles = int(round(density * box.volume))
+        basis = LATTICE_BASES[lattice]
+        lengths = np.asarray(box.box_dims, dtype=float)
+        spacing = np.cbrt(len(basis) / density)
+        cells = np.maximum(np.rint(lengths / spacing), 1).astype(int)
+        # Rounding can leave too few sites, add cells where they are widest.
+        while len(basis) * np.prod(cells) < num_particles:
+            cells[np.argmax(lengths / cells)] += 1
+        grid = np.stack(np.meshgrid(*[np.arange(n) for n in cells],
+                                    indexing='ij'), axis=-1).reshape(-1, 1, 3)
+        fractional = ((grid + basis) / cells).reshape(-1, 3)
+        if num_particles < len(fractional):
+            sites = np.random.choice(len(fractional), num_particles,
+                                     replace=False)
+            fractional = fractional[np.sort(sites)]
+        coordinates = (fractional - 0.5) @ box.cell
+        if jitter:
+            coordinates += np.random.uniform(-jitter, jitter,
+                                             coordinates.shape)
+            box.wrap(coordinates)
+        particles = cls(coordinates, dtype=dtype)
         return ( particles )
 
     @property
     def num_particles(self):
         '''Returns the coordinates of the Particles Object'''
         return len(self.coordinates)
+
+
+    def float_coordinates(self):
+        '''Returns the coordinates as floats, for output and analysis.'''
+        return self.coordinates
+
+    def displace(self, index, displacement):
+        ''' Moves one particle.
+
+        Parameters:
+        -----------
+            index : int
+                The particle to move.
+            displacement : np.array
+                Array of shape (3,) of the move.
+        Returns:
+        --------
+            undo : np.array
+                What `restore` needs to take the move back.
+        '''
+        old_position = self.coordinates[index].copy()
+        self.coordinates[index] += displacement
+        return old_position
+
+    def restore(self, index, undo):
+        ''' Takes back a move made by `displace`.
+
+        Parameters:
+        -----------
+            index : int
+                The particle that was moved.
+            undo : np.array
+                The value returned by `displace`.
+        '''
+        self.coordinates[index] = undo
+
+    def coordinates_by_id(self):
+        '''Returns the coordinates in the original particle order.
+
+        Returns:
+        --------
+            coordinates : np.array
+                Array of shape (n, 3) whose row k belongs to particle id k.
+        '''
+        coordinates = np.empty_like(self.coordinates)
+        coordinates[self.ids] = self.coordinates
+        return coordinates
+
+    def reorder(self, order):
+        ''' Permutes every per-particle array.
+
+        Parameters:
+        -----------
+            order : np.array
+                Permutation of shape (n,); particle order[k] becomes
+                particle k.
+        '''
+        for name in self._per_particle:
+            setattr(self, name, getattr(self, name)[order])
+        if self.groups:
+            new_rows = np.empty(len(order), dtype=int)
+            new_rows[order] = np.arange(len(order))
+            for group in self.groups.values():
+                group.indices = _compact(np.sort(
+                    new_rows[group.index_array]))
+
+    def add_group(self, name, selection):
+        ''' Defines a named group of particles.
+
+        Parameters:
+        -----------
+            name : str
+                The name the group is found under in `groups`.
+            selection : np.array or slice
+                A boolean mask of shape (n,), an array of particle indices
+                or a slice.
+        Returns:
+        --------
+            group : ParticleGroup
+                The new group.
+        '''
+        if isinstance(selection, slice):
+            rows = np.arange(self.num_particles)[selection]
+        else:
+            selection = np.asarray(selection)
+            if selection.dtype == bool:
+                rows = np.flatnonzero(selection)
+            else:
+                rows = np.arange(self.num_particles)[selection]
+        group = ParticleGroup(self, name, _compact(np.unique(rows)))
+        self.groups[name] = group
+        return group
+
+    def group(self, name):
+        '''Returns the ParticleGroup called `name`.'''
+        return self.groups[name]
+
+    def sort_spatially(self, box):
+        ''' Reorders the particles along a Morton (Z-order) curve.
+
+        Particles that are close in space end up close in memory, which
+        keeps neighbor based energy evaluations cache friendly.
+
+        Parameters:
+        -----------
+            box : Box class object
+                The periodic box the particles live in.
+        Returns:
+        --------
+            order : np.array
+                The permutation that was applied, see `reorder`.
+        '''
+        fractional = box.fractional(self.coordinates) + 0.5
+        fractional -= np.floor(fractional)
+        grid = np.minimum(fractional * 2**21, 2**21 - 1).astype(np.uint64)
+        keys = _spread_bits(grid[:, 0]) << np.uint64(2) | \
+            _spread_bits(grid[:, 1]) << np.uint64(1) | \
+            _spread_bits(grid[:, 2])
+        order = np.argsort(keys, kind='stable')
+        self.reorder(order)
+        return order
+
+
+class ParticleGroup():
+    '''A named subset of the particles that does not copy their data.
+
+    Groups are made with `Particles.add_group`. The member rows are kept as
+    a slice when they are contiguous, in which case `coordinates` is a view,
+    and as a sorted index array otherwise, gathered once per access. NumPy
+    functions see a group as its coordinates.
+
+    Parameters
+    ----------
+    particles : Particles
+        The particles the group belongs to.
+    name : str
+        The name of the group.
+    indices : slice or np.array
+        The member rows.
+
+    Returns
+    -------
+    self : ParticleGroup
+        Returns an instance of itself.
+
+    Attributes
+    ----------
+    particles : Particles
+        The particles the group belongs to.
+    name : str
+        The name of the group.
+    indices : slice or np.array
+        The member rows, updated when the particles are reordered.
+    '''
+
+    def __init__(self, particles, name, indices):
+        self.particles = particles
+        self.name = name
+        self.indices = indices
+
+    def __str__(self):
+        return( F'ParticleGroup {self.name!r}: {len(self)} particles.' )
+
+    def __len__(self):
+        if isinstance(self.indices, slice):
+            return self.indices.stop - self.indices.start
+        return len(self.indices)
+
+    @property
+    def num_particles(self):
+        '''Returns the number of particles in the group'''
+        return len(self)
+
+    @property
+    def index_array(self):
+        '''Returns the member rows as an index array.'''
+        if isinstance(self.indices, slice):
+            return np.arange(self.indices.start, self.indices.stop)
+        return self.indices
+
+    @property
+    def coordinates(self):
+        '''Returns the member coordinates, a view for contiguous groups.'''
+        return self.particles.coordinates[self.indices]
+
+    @property
+    def types(self):
+        '''Returns the member types, a view for contiguous groups.'''
+        return self.particles.types[self.indices]
+
+    def __array__(self, dtype=None, copy=None):
+        coordinates = self.coordinates
+        if dtype is not None:
+            coordinates = coordinates.astype(dtype, copy=False)
+        return coordinates.copy() if copy else coordinates
+
+
+class FixedPointParticles(Particles):
+    '''Particles whose coordinates are 32-bit fixed-point fractions.
+
+    Coordinates are np.uint32 ticks of a `FixedPointBox`, which wrap
+    periodically by integer overflow. Moves are applied as whole ticks, so
+    taking one back restores the previous state bit for bit. Float
+    coordinates, such as those of `Particles.from_lattice`, are converted
+    on assignment.
+
+    Parameters
+    ----------
+    coordinates : np.array
+        Array of shape (n, 3) of float coordinates or np.uint32 positions.
+    box : FixedPointBox
+        The box whose edges the positions are fractions of.
+    types : np.array, optional
+        Integer species of each particle, all 0 by default.
+
+    Returns
+    -------
+    self : FixedPointParticles
+        Returns an instance of itself.
+
+    Attributes
+    ----------
+    box : FixedPointBox
+        The box whose edges the positions are fractions of.
+    '''
+    _dtypes = (np.uint32,)
+
+    def __init__(self, coordinates, box, types=None):
+        self.box = box
+        super().__init__(coordinates, dtype=np.uint32, types=types)
+
+    @classmethod
+    def from_file(cls, file_name, box, frame=0):
+        ''' Class method: generates fixed-point particles from file.
+
+        Parameters:
+        -----------
+            file_name : str
+                A string with the path to the XYZ file, optionally gzipped
+                and holding several frames.
+            box : FixedPointBox
+                The box the positions are fractions of.
+            frame : int, optional
+                The frame to read, negative values count from the end.
+        Returns:
+        --------
+            particles : FixedPointParticles class object
+                FixedPointParticles class object.
+        '''
+        coordinates = mcpy.xyz.read_frame(file_name, frame=frame)
+        return cls(coordinates, box)
+
+    @classmethod
+    def from_random(cls, num_particles, box):
+        ''' Class method: generates fixed-point particles randomly.
+
+        Parameters:
+        -----------
+            num_particles : int
+                Number of particles to place uniformly in the box.
+            box : FixedPointBox
+                The box the positions are fractions of.
+        Returns:
+        --------
+            particles : FixedPointParticles class object
+                FixedPointParticles class object.
+        '''
+        particles = Particles.from_random(num_particles, box.box_dims)
+        return cls(particles.coordinates, box)
+
+    @classmethod
+    def from_lattice(cls, box, density=None, num_particles=None,
+                     lattice='fcc', jitter=0.0):
+        ''' Class method: generates fixed-point particles on a lattice.
+
+        Takes the same arguments as `Particles.from_lattice` except for
+        `dtype`, the box must be a FixedPointBox.
+
+        Returns:
+        --------
+            particles : FixedPointParticles class object
+                FixedPointParticles class object.
+        '''
+        particles = Particles.from_lattice(box, density=density,
+                                           num_particles=num_particles,
+                                           lattice=lattice, jitter=jitter)
+        return cls(particles.coordinates, box)
+
+    @Particles.coordinates.setter
+    def coordinates(self, coordinates):
+        coordinates = np.asarray(coordinates)
+        if coordinates.dtype != np.uint32:
+            coordinates = self.box.to_fixed(coordinates)
+        self._coordinates = np.ascontiguousarray(coordinates)
+
+    def float_coordinates(self):
+        '''Returns the coordinates as floats, for output and analysis.'''
+        return self.box.to_float(self.coordinates)
+
+    def displace(self, index, displacement):
+        ''' Moves one particle by a whole number of ticks.
+
+        Parameters:
+        -----------
+            index : int
+                The particle to move.
+            displacement : np.array
+                Array of shape (3,) of the move as floats.
+        Returns:
+        --------
+            undo : np.array
+                The move in ticks, for `restore`.
+        '''
+        ticks = self.box.to_ticks(displacement)
+        self.coordinates[index] += ticks
+        return ticks
+
+    def restore(self, index, undo):
+        ''' Takes back a move made by `displace`.
+
+        Parameters:
+        -----------
+            index : int
+                The particle that was moved.
+            undo : np.array
+                The value returned by `displace`.
+        '''
+        self.coordinates[index] -= undo
+
+
+def _compact(rows):
+    '''Turns sorted unique rows into a slice if they are contiguous.'''
+    if len(rows) == 0:
+        return slice(0, 0)
+    if rows[-1] - rows[0] + 1 == len(rows):
+        return slice(int(rows[0]), int(rows[-1]) + 1)
+    return rows
+
+
+def _spread_bits(x):
+    '''Spaces the lower 21 bits of x three bits apart.'''
+    for shift, mask in ((32, 0x1f00000000ffff),
+                        (16, 0x1f0000ff0000ff),
+                        (8, 0x100f00f00f00f00f),
+                        (4, 0x10c30c30c30c30c3),
+                        (2, 0x1249249249249249)):
+        x = (x | x << np.uint64(shift)) & np.uint64(mask)
+    return x
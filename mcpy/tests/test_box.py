@@ -0,0 +1,182 @@
+from mcpy.box import Box, TriclinicBox, FixedPointBox
+from mcpy.particles import Particles, FixedPointParticles
+from mcpy.pairwise import LJ
+import pytest
+import numpy as np
+
+
+@pytest.mark.parametrize("index", [0, 17, 199])
+def test_minimum_image_distance_into(index):
+    np.random.seed(3)
+    box = Box(np.array([6.0, 7.5, 9.0]))
+    coordinates = (np.random.rand(200, 3) - 0.5) * 3 * box.box_dims
+    out = np.empty(200)
+    work = np.empty((2, 200, 3))
+    expected = box.minimum_image_distance(index, coordinates)
+    calculated = box.minimum_image_distance_into(index, coordinates,
+                                                 out, work)
+
+    assert calculated is out
+    assert out[index] == np.inf
+    assert np.array_equal(np.delete(out, index), expected)
+
+
+def test_triclinic_matches_orthorhombic():
+    np.random.seed(4)
+    box_dims = np.array([6.0, 7.5, 9.0])
+    box = Box(box_dims)
+    triclinic = TriclinicBox(np.diag(box_dims))
+    coordinates = (np.random.rand(50, 3) - 0.5) * 2 * box_dims
+
+    assert np.isclose(triclinic.volume, box.volume)
+    assert np.allclose(triclinic.minimum_image_distance(3, coordinates),
+                       box.minimum_image_distance(3, coordinates))
+
+
+def test_triclinic_minimum_image():
+    np.random.seed(5)
+    cell = np.array([[8.0, 0.0, 0.0],
+                     [2.0, 7.0, 0.0],
+                     [-1.5, 1.0, 9.0]])
+    box = TriclinicBox(cell)
+    coordinates = (np.random.rand(40, 3) - 0.5) @ cell
+    images = np.stack(np.meshgrid([-1, 0, 1], [-1, 0, 1], [-1, 0, 1],
+                                  indexing='ij'), axis=-1).reshape(-1, 3)
+    coord_ij = coordinates[0] - coordinates[1:]
+    all_images = coord_ij[:, np.newaxis, :] + (images @ cell)[np.newaxis]
+    brute_force = np.min(np.sum(np.square(all_images), axis=2), axis=1)
+    calculated = box.minimum_image_distance(0, coordinates)
+    out = np.empty(40)
+    box.minimum_image_distance_into(0, coordinates, out,
+                                    np.empty((2, 40, 3)))
+
+    # Fractional rounding finds the true minimum image within a half width.
+    close = brute_force < np.square(0.5 * box.widths.min())
+    assert np.allclose(calculated[close], brute_force[close])
+    assert np.allclose(out[1:], calculated)
+    wrapped = box.wrap(coordinates + 3 * cell[1])
+    assert np.all(np.abs(box.fractional(wrapped)) <= 0.5)
+
+
+def test_triclinic_cell_list():
+    np.random.seed(6)
+    cell = np.array([[9.0, 0.0, 0.0],
+                     [3.0, 9.0, 0.0],
+                     [0.0, 2.0, 9.0]])
+    box = TriclinicBox(cell)
+    coordinates = (np.random.rand(300, 3) - 0.5) @ cell
+    lj = LJ(cutoff=2.5)
+    expected = [lj(box.minimum_image_distance(i, coordinates))
+                for i in range(0, 300, 11)]
+    box.build_cell_list(coordinates, 2.5)
+    calculated = [lj(box.particle_distances(i, coordinates))
+                  for i in range(0, 300, 11)]
+
+    assert np.allclose(expected, calculated)
+
+
+def test_multi_image_energy():
+    np.random.seed(7)
+    box = Box(np.full(3, 4.0))
+    coordinates = (np.random.rand(12, 3) - 0.5) * box.box_dims
+    lj = LJ(cutoff=5.0)
+    images = box.enable_images(lj.cutoff)
+    steps = np.stack(np.meshgrid(*[np.arange(-3, 4)] * 3, indexing='ij'),
+                     axis=-1).reshape(-1, 3)
+    shifts = steps * box.box_dims
+    coord_ij = coordinates[0] - coordinates[1:]
+    brute_force = np.sum(np.square(coord_ij[:, np.newaxis, :] + shifts),
+                         axis=2)
+
+    assert images is not None
+    assert np.isclose(lj(box.particle_distances(0, coordinates)),
+                      lj(brute_force.ravel()))
+    shift2 = np.sum(np.square(shifts), axis=1)
+    assert np.isclose(lj(box.self_image_distances()), lj(shift2[shift2 > 0]))
+    assert box.enable_images(1.5) is None
+
+
+@pytest.mark.parametrize("box", [
+    Box(np.array([6.0, 7.0, 8.0])),
+    TriclinicBox([[6.0, 0.0, 0.0], [1.0, 7.0, 0.0], [0.5, -1.0, 8.0]]),
+])
+def test_distance_block(box):
+    np.random.seed(9)
+    coordinates = (np.random.rand(60, 3) - 0.5) @ box.cell
+    indices = np.array([4, 0, 59])
+    block = box.distance_block(coordinates, indices=indices)
+    for row, index in enumerate(indices):
+        assert np.allclose(np.delete(block[row], index),
+                           box.minimum_image_distance(index, coordinates))
+        assert block[row, index] == np.inf
+
+    probes = coordinates[indices] + 0.1
+    i, j, rij2 = box.distance_block(coordinates, positions=probes,
+                                    cutoff=2.0, sparse=True)
+    dense = box.distance_block(coordinates, positions=probes)
+    assert np.all(rij2 < 4.0)
+    assert len(rij2) == np.count_nonzero(dense < 4.0)
+    assert np.allclose(dense[i, j], rij2)
+    with pytest.raises(ValueError):
+        box.distance_block(coordinates)
+
+
+def test_fixed_point_distances():
+    np.random.seed(8)
+    box_dims = np.array([6.0, 7.5, 9.0])
+    box = Box(box_dims)
+    fixed_box = FixedPointBox(box_dims)
+    coordinates = (np.random.rand(200, 3) - 0.5) * 3 * box_dims
+    particles = FixedPointParticles(coordinates, fixed_box)
+    out = np.empty(200)
+    work = np.empty((2, 200, 3))
+    expected = box.minimum_image_distance(17, coordinates)
+    into = fixed_box.minimum_image_distance_into(17, particles.coordinates,
+                                                 out, work)
+
+    assert particles.coordinates.dtype == np.uint32
+    assert np.allclose(fixed_box.minimum_image_distance(
+        17, particles.coordinates), expected)
+    assert np.allclose(np.delete(into, 17), expected)
+    assert np.allclose(particles.float_coordinates(),
+                       box.wrap(coordinates.copy()))
+
+
+def test_fixed_point_moves_are_exact():
+    np.random.seed(9)
+    box = FixedPointBox(np.full(3, 5.0))
+    particles = FixedPointParticles(Particles.from_random(
+        50, box.box_dims).coordinates, box)
+    start = particles.coordinates.copy()
+    for _ in range(100):
+        i = np.random.randint(50)
+        undo = particles.displace(i, 4.0 * np.random.rand(3) - 2.0)
+        particles.restore(i, undo)
+
+    assert np.array_equal(particles.coordinates, start)
+    # Crossing the boundary wraps through integer overflow.
+    particles.coordinates[0] = box.to_fixed([2.45, 0.0, 0.0])
+    particles.displace(0, [0.1, 0.0, 0.0])
+    assert np.allclose(particles.float_coordinates()[0], [-2.45, 0.0, 0.0])
+
+
+
+@pytest.mark.parametrize("constructor", [
+    lambda cls, box: cls.from_file('mcpy/tests/sample_config1.xyz',
+                                   *([box] if cls is FixedPointParticles
+                                     else [])),
+    lambda cls, box: cls.from_random(30, box if cls is FixedPointParticles
+                                     else box.box_dims),
+    lambda cls, box: cls.from_lattice(box, num_particles=32, jitter=0.1),
+])
+def test_fixed_point_constructors(constructor):
+    box = FixedPointBox(np.full(3, 8.0))
+    np.random.seed(3)
+    expected = constructor(Particles, box).coordinates
+    np.random.seed(3)
+    particles = constructor(FixedPointParticles, box)
+
+    assert type(particles) is FixedPointParticles
+    assert particles.coordinates.dtype == np.uint32
+    assert np.allclose(particles.float_coordinates(),
+                       box.wrap(expected.copy()), atol=1e-6)
@@ -1,5 +1,6 @@
 import pytest
 import contextlib
+import warnings
 import numpy as np
 import mcpy.particles
 import mcpy.box
@@ -42,3 +43,190 @@ def test_energy_convergence(mcsimulation):
         mcsimulation.steps > 499000]) / mcsimulation.particles.num_particles
     # assert that energy converges to NIST values
     assert np.isclose(average_energy, -6.1773, atol=2e-1)
+
+
+def test_small_box_total_energy_with_images():
+    np.random.seed(8)
+    box = mcpy.box.Box(np.full(3, 4.0))
+    part = mcpy.particles.Particles.from_random(10, box.box_dims)
+    lj = mcpy.pairwise.LJ(cutoff=5.0)
+    mc = mcpy.mcsimulation.MCSimulation()
+    mc.add_box(box)
+    mc.add_particles(part)
+    mc.add_potential(lj)
+    steps = np.stack(np.meshgrid(*[np.arange(-3, 4)] * 3, indexing='ij'),
+                     axis=-1).reshape(-1, 3)
+    coord_ij = part.coordinates[:, np.newaxis, np.newaxis, :] - \
+        part.coordinates[np.newaxis, :, np.newaxis, :] + \
+        steps * box.box_dims
+    rij2 = np.sum(np.square(coord_ij), axis=3)
+    expected = 0.5 * lj(rij2[rij2 > 0]) + lj.cutoff_correction(box, 10)
+
+    assert np.isclose(mc.calculate_total_energy(), expected)
+
+
+@pytest.mark.parametrize("block_size, cell_list_threshold", [
+    (7, 10000),
+    (1000, 10000),
+    (256, 100),
+])
+def test_total_energy_paths(mcsimulation, block_size, cell_list_threshold):
+    box = mcsimulation.box
+    coordinates = mcsimulation.particles.coordinates
+    lj = mcsimulation.potential
+    expected = lj.cutoff_correction(box, len(coordinates))
+    for i in range(len(coordinates) - 1):
+        expected += lj(box.minimum_image_distance(0, coordinates[i:]))
+    mcsimulation.block_size = block_size
+    mcsimulation.cell_list_threshold = cell_list_threshold
+
+    assert np.isclose(mcsimulation.calculate_total_energy(), expected)
+
+
+def test_reorder_keeps_energy(mcsimulation):
+    mcsimulation.reorder_frequency = 50
+    mcsimulation.box.build_cell_list(mcsimulation.particles.coordinates, 3.)
+    mcsimulation.run(200, supress_output=True)
+
+    assert np.isclose(mcsimulation.energy,
+                      mcsimulation.calculate_total_energy())
+
+
+def test_single_precision_energy(mcsimulation):
+    mcsimulation.run(2000, supress_output=True)
+    coordinates = mcsimulation.particles.coordinates
+    mcsimulation.particles = mcpy.particles.Particles(coordinates,
+                                                      dtype=np.float32)
+    single = mcsimulation.calculate_total_energy()
+    mcsimulation.particles = mcpy.particles.Particles(
+        mcsimulation.particles.coordinates, dtype=np.float64)
+
+    assert isinstance(single, np.float64)
+    assert np.isclose(single, mcsimulation.calculate_total_energy())
+
+
+def _typed_brute_force_energy(box, particles, lj):
+    coordinates = particles.coordinates
+    types = particles.types
+    energy = 0.0
+    for i in range(particles.num_particles - 1):
+        rij2 = box.minimum_image_distance(0, coordinates[i:])
+        energy += lj(rij2, types[i], types[i + 1:])
+    counts = np.bincount(types, minlength=lj.num_types)
+    return energy + lj.cutoff_correction(box, particles.num_particles, counts)
+
+
+@pytest.mark.parametrize("neighbors", [None, 'cells'])
+def test_multi_species_energy(neighbors):
+    np.random.seed(11)
+    box = mcpy.box.Box(np.full(3, 7.0))
+    particles = mcpy.particles.Particles.from_lattice(
+        box, num_particles=250, jitter=0.1)
+    particles.types = np.random.randint(3, size=250)
+    lj = mcpy.pairwise.LJ(sigma=[1.0, 0.9, 1.1], epsilon=[1.0, 0.5, 1.5],
+                          cutoff=[[2.5, 2.5, 2.8], [2.5, 2.2, 2.5],
+                                  [2.8, 2.5, 3.0]])
+    mc = mcpy.mcsimulation.MCSimulation(frequency=500)
+    mc.add_box(box)
+    mc.add_particles(particles)
+    mc.add_potential(lj)
+    mc.add_integrator(mcpy.integrator.Integrator(beta=1.0,
+                                                 max_displacement=0.1))
+    if neighbors is not None:
+        box.build_cell_list(particles.coordinates, lj.cutoff)
+
+    assert np.isclose(mc.calculate_total_energy(),
+                      _typed_brute_force_energy(box, particles, lj))
+    mc.run(500, supress_output=True)
+    mc.reorder_particles()
+    assert np.isclose(mc.energy, _typed_brute_force_energy(box, particles, lj))
+    assert np.isclose(mc.energy, mc.calculate_total_energy())
+
+
+def test_fixed_point_simulation():
+    box_dims = np.full(3, np.cbrt(200 / 0.8))
+    box = mcpy.box.Box(box_dims)
+    fixed_box = mcpy.box.FixedPointBox(box_dims)
+    coordinates = mcpy.particles.Particles.from_lattice(
+        box, num_particles=200).coordinates
+    energies = []
+    for box, particles in [
+            (box, mcpy.particles.Particles(coordinates)),
+            (fixed_box, mcpy.particles.FixedPointParticles(coordinates,
+                                                           fixed_box))]:
+        np.random.seed(4)
+        mc = mcpy.mcsimulation.MCSimulation(frequency=1000)
+        mc.add_box(box)
+        mc.add_particles(particles)
+        mc.add_potential(mcpy.pairwise.LJ(cutoff=2.5))
+        mc.add_integrator(mcpy.integrator.Integrator(beta=1.0))
+        mc.run(1000, supress_output=True)
+        energies.append(mc.energy)
+
+        assert np.isclose(mc.energy, mc.calculate_total_energy())
+    assert np.isclose(energies[0], energies[1])
+
+
+def test_group_moves_and_energy():
+    np.random.seed(12)
+    box = mcpy.box.Box(np.full(3, 7.0))
+    particles = mcpy.particles.Particles.from_lattice(box, num_particles=200,
+                                                      jitter=0.05)
+    particles.add_group('mobile', np.arange(200) % 3 == 0)
+    particles.add_group('all', slice(None))
+    frozen = particles.coordinates[np.arange(200) % 3 != 0].copy()
+    mc = mcpy.mcsimulation.MCSimulation(frequency=500, block_size=64)
+    mc.add_box(box)
+    mc.add_particles(particles)
+    mc.add_potential(mcpy.pairwise.LJ(cutoff=2.5))
+    mc.add_integrator(mcpy.integrator.Integrator(beta=1.0, group='mobile'))
+    mc.run(500, supress_output=True)
+    e_correction = mc.potential.cutoff_correction(box, 200)
+
+    assert np.array_equal(particles.coordinates[np.arange(200) % 3 != 0],
+                          frozen)
+    assert np.isclose(mc.calculate_group_energy('all') + e_correction,
+                      mc.calculate_total_energy())
+
+
+@pytest.mark.parametrize("cells", [False, True])
+def test_square_well_contact_tracking(cells):
+    np.random.seed(3)
+    box = mcpy.box.Box(np.full(3, 6.0))
+    part = mcpy.particles.Particles.from_lattice(box, density=0.6)
+    sw = mcpy.pairwise.SW(epsilon=0.3, well_range=1.4)
+    if cells:
+        box.build_cell_list(part.coordinates, sw.cutoff)
+    mc = mcpy.mcsimulation.MCSimulation(frequency=500)
+    mc.add_integrator(mcpy.integrator.Integrator(1.0))
+    mc.add_box(box)
+    mc.add_particles(part)
+    mc.add_potential(sw)
+    sw.track_contacts(box, part.coordinates)
+    mc.run(2000, supress_output=True)
+    tracked = sw.contacts.copy()
+
+    assert np.array_equal(tracked, sw.track_contacts(box, part.coordinates))
+    assert mc.energy == -0.3 * sw.num_contacts
+    assert np.isclose(mc.energy, mc.calculate_total_energy())
+
+
+@pytest.mark.parametrize("backend", ['numpy', 'numba'])
+def test_hard_spheres_leave_overlapping_start(backend):
+    np.random.seed(6)
+    box = mcpy.box.Box(np.full(3, 6.0))
+    part = mcpy.particles.Particles.from_lattice(box, density=0.3)
+    part.coordinates[1] = part.coordinates[0] + 0.5
+    hs = mcpy.pairwise.HS()
+    mc = mcpy.mcsimulation.MCSimulation(frequency=500, backend=backend)
+    mc.add_integrator(mcpy.integrator.Integrator(1.0, max_displacement=0.5))
+    mc.add_box(box)
+    mc.add_particles(part)
+    mc.add_potential(hs)
+    assert mc.calculate_total_energy() == np.inf
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        mc.run(2000, supress_output=True)
+
+    assert mc.calculate_total_energy() == 0.0
+    assert mc.energy == 0.0
@@ -1,7 +1,7 @@
 from mcpy.integrator import Integrator
 from mcpy.box import Box
 from mcpy.particles import Particles
-from mcpy.pairwise import LJ 
+from mcpy.pairwise import LJ, HS
 import pytest
 import sys
 import numpy as np
@@ -31,3 +31,29 @@ def test_accept_or_reject():
 
     assert abs( p_acc - 0.9 ) <= 0.01
 
+
+
+def test_accept_or_reject_infinite():
+    inte = Integrator(1.0)
+    with np.errstate(all='raise'):
+        assert not inte.accept_or_reject(np.inf)
+        assert not inte.accept_or_reject(np.inf - np.inf)
+
+
+@pytest.mark.parametrize("cells", [False, True])
+def test_hard_sphere_moves_avoid_overlaps(cells):
+    np.random.seed(4)
+    box = Box(np.full(3, 6.0))
+    particles = Particles.from_lattice(box, density=0.7)
+    hs = HS()
+    if cells:
+        box.build_cell_list(particles.coordinates, hs.cutoff)
+    inte = Integrator(1.0, max_displacement=0.3)
+    accepted = [inte(hs, particles, box, False, 0.5) for _ in range(2000)]
+
+    assert all(delta_e in (0.0, np.inf) for _, delta_e in accepted)
+    assert 0 < sum(acc for acc, _ in accepted) < 2000
+    rij2 = box.distance_block(particles.coordinates,
+                              indices=np.arange(len(particles.coordinates)))
+    np.fill_diagonal(rij2, np.inf)
+    assert rij2.min() >= 1.0
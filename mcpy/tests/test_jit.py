@@ -0,0 +1,111 @@
+import mcpy.jit
+from mcpy.box import Box
+from mcpy.particles import Particles
+from mcpy.pairwise import LJ, HS
+from mcpy.integrator import Integrator
+from mcpy.mcsimulation import MCSimulation
+import pytest
+import numpy as np
+
+
+@pytest.fixture
+def system():
+    np.random.seed(2)
+    box = Box(np.full(3, 6.0))
+    particles = Particles.from_lattice(box, num_particles=150, jitter=0.1)
+    return LJ(cutoff=2.5), particles, box
+
+
+def test_kernels_match_numpy(system):
+    lj, particles, box = system
+    integrator = Integrator(beta=1.0)
+    expected = integrator.get_particle_energy(lj, particles, box, 5)
+    displacement = np.array([0.1, -0.2, 0.05])
+    old, new = mcpy.jit.trial_energies(lj, particles, box, 5, displacement)
+    particles.coordinates[5] += displacement
+    moved = integrator.get_particle_energy(lj, particles, box, 5)
+
+    assert np.isclose(mcpy.jit.particle_energy(lj, particles, box, 5),
+                      moved)
+    assert np.isclose(old, expected)
+    assert np.isclose(new, moved)
+    mc = MCSimulation()
+    mc.add_box(box)
+    mc.add_particles(particles)
+    mc.add_potential(lj)
+    assert np.isclose(mcpy.jit.total_energy(lj, particles, box) +
+                      lj.cutoff_correction(box, 150),
+                      mc.calculate_total_energy())
+
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+def test_backend_runs_same_trajectory(system, dtype):
+    energies = []
+    for backend in ['numpy', 'numba']:
+        lj, particles, box = system
+        particles = Particles(particles.coordinates.copy(), dtype=dtype)
+        np.random.seed(7)
+        mc = MCSimulation(frequency=1000, backend=backend)
+        mc.add_box(box)
+        mc.add_particles(particles)
+        mc.add_potential(lj)
+        mc.add_integrator(Integrator(beta=1.0))
+        if backend == 'numba' and not mcpy.jit.available:
+            with pytest.warns(RuntimeWarning):
+                mc.run(1000, supress_output=True)
+        else:
+            mc.run(1000, supress_output=True)
+        energies.append(mc.energy)
+
+        assert np.isclose(mc.energy, mc.calculate_total_energy(),
+                          rtol=0, atol=1e-9)
+    assert np.isclose(energies[0], energies[1], rtol=0, atol=1e-9)
+
+
+def test_backend_falls_back_for_neighbor_lists(system):
+    lj, particles, box = system
+    box.build_cell_list(particles.coordinates, lj.cutoff)
+    mc = MCSimulation(backend='numba')
+    mc.add_box(box)
+    mc.add_particles(particles)
+    mc.add_potential(lj)
+    mc.add_integrator(Integrator(beta=1.0))
+    with pytest.warns(RuntimeWarning):
+        mc.run(10, supress_output=True)
+
+    assert mc.integrators[0].backend == 'numpy'
+
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+def test_hard_sphere_kernels(system, dtype):
+    _, particles, box = system
+    particles = Particles(particles.coordinates, dtype=dtype)
+    hs = HS(sigma=0.75)
+    integrator = Integrator(beta=1.0)
+    assert mcpy.jit.supports(hs, particles, box)
+    assert mcpy.jit.total_energy(hs, particles, box) == 0.0
+    onto_neighbor = particles.coordinates[6] - particles.coordinates[5] + 0.1
+    for displacement in [np.zeros(3), onto_neighbor]:
+        old, new = mcpy.jit.trial_energies(hs, particles, box, 5,
+                                           displacement)
+        particles.coordinates[5] += displacement
+        assert old == 0.0
+        assert new == integrator.get_particle_energy(hs, particles, box, 5)
+        assert new == mcpy.jit.particle_energy(hs, particles, box, 5)
+    assert mcpy.jit.total_energy(hs, particles, box) == np.inf
+
+
+def test_hard_sphere_contact_in_float64():
+    box = Box(np.full(3, 6.0))
+    particles = Particles([[0.0, 0.0, 0.0], [0.1, 0.0, 0.0]],
+                          dtype=np.float32)
+    # The float32 difference of these rounds away from the float64 one.
+    particles.coordinates[:, 0] = [2.9123, -0.000123457]
+    contact2 = float(np.sum(np.square(box.separations(
+        particles.coordinates[0], particles.coordinates[1]))))
+    integrator = Integrator(beta=1.0)
+    for bump, expected in [(1.0 - 1e-12, 0.0), (1.0 + 1e-12, np.inf)]:
+        hs = HS(sigma=np.sqrt(contact2 * bump))
+        assert integrator.get_particle_energy(hs, particles, box, 0) == \
+            expected
+        assert mcpy.jit.particle_energy(hs, particles, box, 0) == expected
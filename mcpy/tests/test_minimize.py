@@ -0,0 +1,69 @@
+from mcpy.box import Box
+from mcpy.particles import Particles
+from mcpy.pairwise import LJ
+from mcpy.minimize import Minimizer
+from mcpy.mcsimulation import MCSimulation
+import pytest
+import numpy as np
+
+
+@pytest.fixture
+def simulation():
+    np.random.seed(5)
+    box = Box(np.full(3, 5.0))
+    mc = MCSimulation()
+    mc.add_box(box)
+    mc.add_particles(Particles.from_random(90, box.box_dims))
+    mc.add_potential(LJ(cutoff=2.5))
+    return mc
+
+
+def test_forces_match_finite_differences(simulation):
+    mc = simulation
+    minimizer = Minimizer()
+    coordinates = Particles.from_lattice(mc.box, num_particles=90,
+                                         jitter=0.2).coordinates
+    _, forces = minimizer.forces(mc.potential, mc.box, coordinates)
+    h = 1e-6
+    for k in range(3):
+        shifted = coordinates.copy()
+        shifted[3, k] += h
+        e_plus = minimizer.forces(mc.potential, mc.box, shifted)[0]
+        shifted[3, k] -= 2 * h
+        e_minus = minimizer.forces(mc.potential, mc.box, shifted)[0]
+        assert np.isclose(forces[3, k], -(e_plus - e_minus) / (2 * h),
+                          rtol=1e-4)
+    assert np.allclose(forces.sum(axis=0), 0.0, atol=1e-6 * np.abs(forces).max())
+
+
+@pytest.mark.parametrize("method", ['fire', 'steepest'])
+def test_minimizer_relaxes_random_start(simulation, method):
+    mc = simulation
+    start = mc.calculate_total_energy()
+    minimizer = Minimizer(method=method, force_tolerance=1e-2,
+                          max_iterations=20000)
+    energy = mc.minimize(minimizer)
+
+    assert start > 1e3
+    assert energy < -3.0 * mc.particles.num_particles
+    assert np.isclose(energy, mc.calculate_total_energy())
+    assert minimizer.converged
+    assert minimizer.max_force <= 1e-2
+
+
+def test_minimizer_rejects_large_cutoff(simulation):
+    mc = simulation
+    with pytest.raises(ValueError):
+        Minimizer()(LJ(cutoff=3.0), mc.particles, mc.box)
+
+
+def test_fire_converges_dense_random_start():
+    np.random.seed(3)
+    box = Box(np.full(3, np.cbrt(200 / 0.9)))
+    particles = Particles.from_random(200, box.box_dims)
+    minimizer = Minimizer(max_iterations=2500)
+    energy = minimizer(LJ(cutoff=2.5), particles, box)
+
+    assert minimizer.converged
+    assert minimizer.max_force <= 1e-3
+    assert energy < -7.0 * 200
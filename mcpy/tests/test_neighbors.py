@@ -0,0 +1,164 @@
+from mcpy.box import Box
+from mcpy.particles import Particles
+from mcpy.pairwise import LJ
+from mcpy.integrator import Integrator
+from mcpy.mcsimulation import MCSimulation
+import pytest
+import numpy as np
+
+
+@pytest.fixture
+def system():
+    np.random.seed(0)
+    num_particles = 400
+    box_dims = np.full(3, np.cbrt(num_particles / 0.8))
+    box = Box(box_dims)
+    particles = Particles.from_random(num_particles, box_dims)
+    return box, particles
+
+
+@pytest.mark.parametrize("cutoff", [1.5, 2.5, 3.5])
+def test_cell_list_particle_energy(system, cutoff):
+    box, particles = system
+    lj = LJ(cutoff=cutoff)
+    expected = [lj(box.minimum_image_distance(i, particles.coordinates))
+                for i in range(particles.num_particles)]
+    box.build_cell_list(particles.coordinates, cutoff)
+    calculated = [lj(box.particle_distances(i, particles.coordinates))
+                  for i in range(particles.num_particles)]
+
+    assert np.allclose(expected, calculated)
+
+
+def test_cell_list_bins_every_particle(system):
+    box, particles = system
+    cells = box.build_cell_list(particles.coordinates, 2.5)
+    occupied = cells.cell_particles[cells.cell_particles >= 0]
+
+    assert np.array_equal(np.sort(occupied),
+                          np.arange(particles.num_particles))
+    assert cells.cell_counts.sum() == particles.num_particles
+
+
+def test_cell_list_rejects_large_cutoff(system):
+    box, particles = system
+    with pytest.raises(ValueError):
+        box.build_cell_list(particles.coordinates, box.box_dims[0])
+
+
+def test_cell_list_follows_moves(system):
+    box, particles = system
+    lj = LJ(cutoff=2.5)
+    box.build_cell_list(particles.coordinates, 2.5)
+    integrator = Integrator(beta=1.0, max_displacement=0.5)
+    for _ in range(200):
+        integrator(lj, particles, box, False, 0.4)
+    i = 7
+    expected = lj(box.minimum_image_distance(i, particles.coordinates))
+
+    assert np.isclose(lj(box.particle_distances(i, particles.coordinates)),
+                      expected)
+
+
+def test_verlet_list_matches_full_scan(system):
+    box, particles = system
+    lj = LJ(cutoff=2.5)
+    verlet = box.build_verlet_list(particles.coordinates, 2.5, skin=0.4)
+    integrator = Integrator(beta=1.0, max_displacement=0.3)
+    for _ in range(1000):
+        integrator(lj, particles, box, False, 0.4)
+    for i in range(0, particles.num_particles, 37):
+        expected = lj(box.minimum_image_distance(i, particles.coordinates))
+        calculated = lj(box.particle_distances(i, particles.coordinates))
+        assert np.isclose(calculated, expected)
+
+    # Refreshes keep exactly the pairs within cutoff + skin of the
+    # reference positions, without rebuilding the whole list.
+    assert verlet.num_builds == 1
+    assert verlet.num_refreshes > 0
+    i, j, _ = verlet.pairs(particles.coordinates)
+    rij2 = box.distance_block(verlet.reference,
+                              indices=np.arange(particles.num_particles))
+    expected_i, expected_j = np.nonzero(np.triu(rij2 < 2.9 ** 2, k=1))
+    assert np.array_equal(np.sort(i * particles.num_particles + j),
+                          expected_i * particles.num_particles + expected_j)
+    assert np.array_equal(verlet.partner_counts,
+                          np.count_nonzero(verlet.partner_table >= 0,
+                                           axis=1))
+
+
+def test_total_energy_from_neighbors():
+    np.random.seed(1)
+    box = Box(np.full(3, 8.0))
+    particles = Particles.from_random(300, box.box_dims)
+    mc = MCSimulation()
+    mc.add_box(box)
+    mc.add_particles(particles)
+    mc.add_potential(LJ(cutoff=3.0))
+    expected = mc.calculate_total_energy()
+    box.build_verlet_list(particles.coordinates, 3.0, skin=0.5)
+
+    assert np.isclose(mc.calculate_total_energy(), expected)
+    box.build_cell_list(particles.coordinates, 3.0)
+    assert np.isclose(mc.calculate_total_energy(), expected)
+
+
+def test_cell_list_incremental_update(system):
+    box, particles = system
+    lj = LJ(cutoff=2.5)
+    cells = box.build_cell_list(particles.coordinates, 2.5)
+    integrator = Integrator(beta=1.0, max_displacement=0.5)
+    for _ in range(2000):
+        integrator(lj, particles, box, False, 0.4)
+    incremental = (cells.particle_cell.copy(), cells.cell_counts.copy())
+    slots = cells.cell_particles[cells.particle_cell, cells.particle_slot]
+
+    assert np.array_equal(slots, np.arange(particles.num_particles))
+    cells.build(particles.coordinates)
+
+    assert cells.num_crossings > 0
+    assert np.array_equal(incremental[0], cells.particle_cell)
+    assert np.array_equal(incremental[1], cells.cell_counts)
+    assert cells.num_overfull == 0
+
+
+def test_kdtree_matches_full_scan(system):
+    pytest.importorskip("scipy")
+    box, particles = system
+    lj = LJ(cutoff=2.5)
+    tree = box.build_kdtree(particles.coordinates, 2.5, skin=0.4)
+    integrator = Integrator(beta=1.0, max_displacement=0.15)
+    for _ in range(500):
+        integrator(lj, particles, box, False, 0.4)
+    for i in range(0, particles.num_particles, 37):
+        expected = lj(box.minimum_image_distance(i, particles.coordinates))
+        calculated = lj(box.particle_distances(i, particles.coordinates))
+        assert np.isclose(calculated, expected)
+
+    mc = MCSimulation()
+    mc.add_box(box)
+    mc.add_particles(particles)
+    mc.add_potential(lj)
+    expected = mc.calculate_total_energy()
+    box.neighbors = None
+    assert np.isclose(mc.calculate_total_energy(), expected)
+    assert tree.num_builds > 1
+
+
+def test_verlet_refresh_grows_rows_for_clusters():
+    np.random.seed(2)
+    box = Box(np.full(3, 12.0))
+    clusters = [np.random.uniform(-0.5, 0.5, (60, 3)) + [x, 0.0, 0.0]
+                for x in (-2.0, 2.0)]
+    coordinates = np.concatenate(([[0.0, 5.0, 5.0]], *clusters))
+    verlet = box.build_verlet_list(coordinates, 2.5, skin=0.3)
+    coordinates[0] = 0.0
+    verlet.update(0, coordinates)
+    indices, rij2 = verlet.query(0, coordinates)
+
+    assert verlet.num_refreshes == 1
+    assert len(indices) == 120
+    assert np.array_equal(np.sort(indices), np.arange(1, 121))
+    assert np.array_equal(verlet.partner_counts,
+                          np.count_nonzero(verlet.partner_table >= 0,
+                                           axis=1))
@@ -1,4 +1,7 @@
-from mcpy.particles import Particles
+from mcpy.particles import Particles, FixedPointParticles
+import mcpy.xyz
+from mcpy.box import Box, FixedPointBox
+import gzip
 import pytest
 import sys
 import numpy as np 
@@ -28,3 +31,143 @@ def test_from_random():
 
     assert(expected_num_particles == calculated_num_particles)
     assert(particles_within_the_box)
+
+
+def test_sort_spatially():
+    np.random.seed(10)
+    box = Box(np.array([5.0, 6.0, 7.0]))
+    particles = Particles.from_random(200, box.box_dims)
+    original = particles.coordinates.copy()
+    order = particles.sort_spatially(box)
+
+    assert np.array_equal(particles.coordinates, original[order])
+    assert np.array_equal(particles.ids, order)
+    assert np.array_equal(particles.coordinates_by_id(), original)
+    # Consecutive particles are closer than in random order.
+    step = np.linalg.norm(np.diff(particles.coordinates, axis=0), axis=1)
+    random_step = np.linalg.norm(np.diff(original, axis=0), axis=1)
+    assert np.mean(step) < 0.5 * np.mean(random_step)
+
+
+def test_coordinate_storage():
+    coordinates = np.asfortranarray(np.random.rand(20, 6))[:, ::2]
+    particles = Particles(coordinates, dtype=np.float32)
+
+    assert particles.coordinates.dtype == np.float32
+    assert particles.coordinates.flags['C_CONTIGUOUS']
+    assert np.allclose(particles.coordinates, coordinates)
+    particles.coordinates = np.ones((20, 3), dtype=int)
+    assert particles.coordinates.dtype == np.float32
+    with pytest.raises(ValueError):
+        Particles(coordinates, dtype=np.int32)
+
+
+def test_particles_own_coordinates():
+    coordinates = np.random.rand(20, 3)
+    original = coordinates.copy()
+    particles = Particles(coordinates)
+    particles.displace(3, [0.5, 0.5, 0.5])
+    box = FixedPointBox(np.full(3, 2.0))
+    ticks = box.to_fixed(coordinates)
+    fixed = FixedPointParticles(ticks, box)
+    fixed.displace(3, [0.5, 0.5, 0.5])
+
+    assert np.array_equal(coordinates, original)
+    assert not np.shares_memory(particles.coordinates, coordinates)
+    assert np.array_equal(ticks, box.to_fixed(original))
+
+
+def test_from_file_frames(tmp_path):
+    expected = np.loadtxt('mcpy/tests/sample_config1.xyz', skiprows=2,
+                          usecols=(1, 2, 3))
+    particles = Particles.from_file('mcpy/tests/sample_config1.xyz')
+    assert np.array_equal(particles.coordinates, expected)
+
+    frames = [np.random.rand(5, 3) for _ in range(3)]
+    file_name = str(tmp_path / 'trajectory.xyz.gz')
+    with gzip.open(file_name, 'wt') as handle:
+        for frame in frames:
+            handle.write('5\ncomment\n')
+            for x, y, z in frame.tolist():
+                handle.write('Ar {!r} {!r} {!r}\n'.format(x, y, z))
+
+    assert mcpy.xyz.count_frames(file_name) == 3
+    for read, frame in zip(mcpy.xyz.iter_frames(file_name), frames):
+        assert np.array_equal(read, frame)
+    last = Particles.from_file(file_name, dtype=np.float32, frame=-1)
+    assert np.allclose(last.coordinates, frames[-1])
+    assert np.array_equal(mcpy.xyz.read_frame(file_name, frame=1), frames[1])
+    assert np.array_equal(mcpy.xyz.read_frame(file_name, frame=-3), frames[0])
+    with pytest.raises(IndexError):
+        mcpy.xyz.read_frame(file_name, frame=3)
+    with pytest.raises(IndexError):
+        mcpy.xyz.read_frame(file_name, frame=-4)
+    for read, frame in zip(mcpy.xyz.iter_frames(file_name, chunk_size=2),
+                           frames):
+        assert np.array_equal(read, frame)
+
+    truncated = str(tmp_path / 'truncated.xyz')
+    with open(truncated, 'w') as handle:
+        handle.write('3\ncomment\nAr 0 0 0\nAr 1 1 1\n')
+    with pytest.raises(ValueError):
+        mcpy.xyz.read_frame(truncated)
+    with pytest.raises(ValueError):
+        mcpy.xyz.read_frame(truncated, frame=-1)
+    with pytest.raises(ValueError):
+        next(mcpy.xyz.iter_frames(truncated))
+
+
+@pytest.mark.parametrize("lattice, sites", [('sc', 1), ('bcc', 2), ('fcc', 4)])
+def test_from_lattice(lattice, sites):
+    box = Box(np.full(3, 6.0))
+    particles = Particles.from_lattice(box, num_particles=sites * 27,
+                                       lattice=lattice)
+    distances = [box.minimum_image_distance(i, particles.coordinates).min()
+                 for i in range(particles.num_particles)]
+    nearest = {'sc': 2.0, 'bcc': np.sqrt(3.0), 'fcc': np.sqrt(2.0)}[lattice]
+
+    assert particles.num_particles == sites * 27
+    assert np.allclose(np.sqrt(distances), nearest)
+    assert (np.abs(particles.coordinates) <= 3.0).all()
+
+
+def test_from_lattice_vacancies_and_jitter():
+    np.random.seed(3)
+    box = Box(np.array([7.0, 7.0, 9.0]))
+    particles = Particles.from_lattice(box, density=0.8, num_particles=300,
+                                       jitter=0.05)
+    distances = np.concatenate(
+        [box.minimum_image_distance(i, particles.coordinates)
+         for i in range(particles.num_particles)])
+
+    assert particles.num_particles == 300
+    assert np.sqrt(distances.min()) > 0.9
+    assert (np.abs(particles.coordinates) <= box.box_dims / 2).all()
+    with pytest.raises(ValueError):
+        Particles.from_lattice(box, density=0.8, lattice='hcp')
+
+
+def test_particle_groups():
+    np.random.seed(6)
+    box = Box(np.full(3, 5.0))
+    particles = Particles.from_random(60, box.box_dims)
+    solute = particles.add_group('solute', slice(0, 10))
+    solvent = particles.add_group('solvent', np.arange(60) >= 10)
+    odd = particles.add_group('odd', np.arange(1, 60, 2))
+    members = {name: particles.ids[particles.group(name).index_array]
+               for name in particles.groups}
+
+    assert isinstance(solute.indices, slice)
+    assert isinstance(solvent.indices, slice)
+    assert np.shares_memory(solute.coordinates, particles.coordinates)
+    assert np.array_equal(np.asarray(odd), particles.coordinates[1::2])
+    assert len(solvent) == 50
+
+    particles.sort_spatially(box)
+    for name, group in particles.groups.items():
+        assert np.array_equal(np.sort(particles.ids[group.index_array]),
+                              members[name])
+    rij2 = box.distance_block(particles.coordinates, indices=odd)
+    expected = box.distance_block(particles.coordinates,
+                                  indices=odd.index_array)
+    assert np.array_equal(rij2, expected)
@@ -1,7 +1,8 @@
 """
 Unit test for the Pairwise_potential calculation.
 """
-from mcpy.pairwise import LJ
+from mcpy.pairwise import LJ, Tabulated, HS, SW
+from mcpy.box import Box
 import pytest
 import sys
 import numpy as np
@@ -43,3 +44,131 @@ def test_pairwise_potential():
     assert np.isclose(U_mixed_expected,U_mixed_calculated)
 
 
+
+
+def test_lj_force_factor():
+    lj = LJ(sigma=1.1, epsilon=0.8, cutoff=2.5)
+    r = np.array([0.95, 1.1, 1.3, 2.0, 2.6])
+    h = 1e-6
+    dudr = (lj.potential((r + h)**2) - lj.potential((r - h)**2)) / (2 * h)
+    expected = np.where(r < 2.5, -dudr / r, 0.0)
+
+    assert np.allclose(lj.force_factor(r * r), expected, rtol=1e-6)
+
+
+def test_lj_mixing_tables():
+    lj = LJ(sigma=[1.0, 2.0], epsilon=[1.0, 4.0], cutoff=3.0)
+    explicit = LJ(sigma=[[1.0, 1.5], [1.5, 2.0]],
+                  epsilon=[[1.0, 2.0], [2.0, 4.0]], cutoff=3.0)
+    rij2 = np.array([1.2, 2.5, 4.0, 9.5])
+    types_i = np.array([0, 0, 1, 1])
+    types_j = np.array([0, 1, 1, 0])
+    expected = sum(4 * e * ((s * s / r2)**6 - (s * s / r2)**3)
+                   for r2, s, e in zip(rij2[:3], [1.0, 1.5, 2.0],
+                                       [1.0, 2.0, 4.0]))
+
+    assert lj.num_types == 2
+    assert np.allclose(lj.sigma2_table, [[1.0, 2.25], [2.25, 4.0]])
+    assert np.allclose(lj.epsilon_table, [[1.0, 2.0], [2.0, 4.0]])
+    assert np.isclose(lj(rij2, types_i, types_j), expected)
+    assert np.isclose(explicit(rij2, types_i, types_j), expected)
+
+
+def test_lj_cutoff_correction_per_type_pair():
+    class Cube:
+        volume = 1000.0
+    single = LJ(sigma=1.2, epsilon=0.7, cutoff=2.5)
+    double = LJ(sigma=[1.2, 1.2], epsilon=[0.7, 0.7], cutoff=2.5)
+
+    assert np.isclose(double.cutoff_correction(Cube(), 300, [100, 200]),
+                      single.cutoff_correction(Cube(), 300))
+
+
+@pytest.mark.parametrize("num_pairs", [1, 40, 5000])
+def test_lj_fused_kernel(num_pairs):
+    np.random.seed(4)
+    lj = LJ(sigma=1.1, epsilon=0.9, cutoff=2.5)
+    rij2 = 0.9 + 20.0 * np.random.rand(num_pairs)
+    rij2[0] = np.inf
+    inside = rij2[rij2 < 6.25]
+    s6 = (1.21 / inside)**3
+    expected = np.sum(4 * 0.9 * (s6 * s6 - s6))
+
+    assert np.isclose(lj(rij2), expected)
+    assert np.isclose(lj(rij2.reshape(-1, 1)), expected)
+    assert np.isclose(lj(1.1**2), 0.0)
+    assert np.isclose(lj(2.0), 4 * 0.9 * ((1.21 / 2.0)**6 - (1.21 / 2.0)**3))
+    assert lj(6.25) == 0.0
+
+
+@pytest.mark.parametrize("kind", ['linear', 'cubic'])
+def test_tabulated_lj(kind):
+    np.random.seed(5)
+    lj = LJ(cutoff=2.5)
+    table = Tabulated(lj, r_min=0.8, kind=kind, tolerance=1e-5)
+    rij2 = np.random.uniform(0.5, 9.0, 3000)
+    box = Box(np.full(3, 10.0))
+
+    assert table.error <= 1e-5
+    assert np.allclose(table.potential(rij2), np.where(
+        rij2 < 6.25, lj.potential(rij2), 0.0), rtol=0, atol=1e-5)
+    assert np.isclose(table(rij2), lj(rij2), rtol=0, atol=1e-5 * len(rij2))
+    assert np.isclose(table(2.0), lj(2.0), rtol=0, atol=1e-5)
+    assert np.isclose(table.cutoff_correction(box, 500),
+                      lj.cutoff_correction(box, 500))
+    assert np.allclose(table.force_factor(rij2), lj.force_factor(rij2),
+                       rtol=1e-2, atol=1e-3)
+
+
+def test_tabulated_callable():
+    def yukawa(rij2):
+        r = np.sqrt(rij2)
+        return 2.0 * np.exp(-1.5 * r) / r
+
+    table = Tabulated(yukawa, cutoff=3.0, num_points=200, kind='cubic')
+    finer = Tabulated(yukawa, cutoff=3.0, num_points=800, kind='cubic')
+    rij2 = np.linspace(0.3, 8.9, 50)
+    expected = 2.0 * np.pi * 100**2 / 1000.0 * 2.0 * \
+        np.exp(-4.5) * (3.0 / 1.5 + 1 / 1.5**2)
+
+    assert finer.error < table.error
+    assert np.allclose(table.potential(rij2), yukawa(rij2), rtol=0,
+                       atol=table.error)
+
+    class Cube:
+        volume = 1000.0
+    assert np.isclose(table.cutoff_correction(Cube(), 100), expected)
+
+
+def test_hard_spheres():
+    hs = HS(sigma=[1.0, 2.0])
+    rij2 = np.full(10000, 4.0)
+
+    assert hs.cutoff == 2.0
+    assert hs(rij2) == 0.0
+    assert hs.cutoff_correction(Box(np.full(3, 10.0)), 100) == 0.0
+    rij2[-1] = 0.99
+    assert hs(rij2) == np.inf
+    assert hs(0.99) == np.inf
+    assert hs(rij2, 1, 1) == np.inf
+    assert hs(np.array([1.1, 2.2]), 0, np.array([0, 1])) == np.inf
+    assert hs(np.array([1.1, 2.3]), 0, np.array([0, 0])) == 0.0
+    assert np.array_equal(hs.potential(np.array([0.5, 1.0, 3.0])),
+                          [np.inf, 0.0, 0.0])
+
+
+def test_square_well():
+    sw = SW(sigma=1.0, epsilon=0.5, well_range=1.5)
+    rij2 = np.array([1.0, 1.5, 2.2, 2.25, 9.0])
+
+    assert sw.cutoff == 1.5
+    assert sw(rij2) == -1.5
+    assert sw(1.2) == -0.5
+    assert sw(0.9) == np.inf
+    assert sw(np.append(rij2, 0.9)) == np.inf
+    assert np.array_equal(sw.potential(np.array([0.9, 2.0, 3.0])),
+                          [np.inf, -0.5, 0.0])
+    assert np.array_equal(sw.partners(None, rij2), [0, 1, 2])
+    assert np.array_equal(sw.partners(np.array([4, 7, 2, 3, 1]), rij2),
+                          [4, 7, 2])
+    assert sw.partners(None, np.array([0.9, 2.0])) is None
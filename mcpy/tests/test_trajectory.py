@@ -0,0 +1,188 @@
+import mcpy.box
+import mcpy.particles
+import mcpy.pairwise
+import mcpy.integrator
+import mcpy.mcsimulation
+from mcpy.trajectory import TrajectoryWriter, TrajectoryReader, BufferedWriter
+from mcpy.trajectory import CompressedTrajectoryWriter
+from mcpy.trajectory import CompressedTrajectoryReader
+import os
+import time
+import pytest
+import numpy as np
+
+
+@pytest.mark.parametrize("precision", [np.float32, np.float64])
+def test_write_and_read(tmp_path, precision):
+    box = mcpy.box.Box(np.array([4.0, 5.0, 6.0]))
+    frames = np.random.rand(4, 10, 3)
+    file_name = str(tmp_path / 'run.trj')
+    with TrajectoryWriter(file_name, 10, box, precision=precision) as traj:
+        for step, frame in enumerate(frames):
+            traj.write_frame(frame, step=10 * step, energy=-float(step))
+    reader = TrajectoryReader(file_name)
+
+    assert len(reader) == 4
+    assert reader.coordinates.dtype == precision
+    assert np.allclose(reader.coordinates, frames)
+    assert np.allclose(reader[2][[1, 5]], frames[2, [1, 5]])
+    assert np.array_equal(reader.steps, [0, 10, 20, 30])
+    assert np.array_equal(reader.energies, [0, -1, -2, -3])
+    assert np.array_equal(reader.cell, box.cell)
+    assert not reader[1].flags['OWNDATA']
+    assert np.all(np.diff(reader.offsets) == reader.frames.dtype.itemsize)
+
+
+def test_simulation_writes_frames(tmp_path):
+    np.random.seed(11)
+    box = mcpy.box.Box(np.full(3, 6.0))
+    particles = mcpy.particles.Particles.from_random(50, box.box_dims)
+    mc = mcpy.mcsimulation.MCSimulation(reorder_frequency=30)
+    mc.add_box(box)
+    mc.add_particles(particles)
+    mc.add_potential(mcpy.pairwise.LJ(cutoff=2.5))
+    mc.add_integrator(mcpy.integrator.Integrator(1.0))
+    file_name = str(tmp_path / 'run.trj')
+    mc.add_trajectory(TrajectoryWriter(file_name, 50, box), stride=25)
+    mc.run(100, supress_output=True)
+    reader = TrajectoryReader(file_name)
+
+    assert np.array_equal(reader.steps, [25, 50, 75, 100])
+    assert np.allclose(reader[-1], particles.coordinates_by_id())
+
+
+class SlowTrajectory:
+    def __init__(self):
+        self.steps = []
+
+    def write_frame(self, coordinates, step=0, energy=0.0, ids=None):
+        time.sleep(0.01)
+        self.steps.append(step)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_buffered_writer(tmp_path):
+    box = mcpy.box.Box(np.full(3, 5.0))
+    frames = np.random.rand(20, 8, 3)
+    expected = frames.copy()
+    ids = np.random.permutation(8)
+    file_name = str(tmp_path / 'run.trj')
+    log_file = str(tmp_path / 'run.log')
+    with BufferedWriter(TrajectoryWriter(file_name, 8, box), 8, capacity=3,
+                        log_file=log_file) as writer:
+        for step, frame in enumerate(frames):
+            writer.write_frame(frame, step=step, ids=ids)
+            frame[:] = 0.0
+            writer.write_log(step, -1.5, [0.25, 0.5])
+    reader = TrajectoryReader(file_name)
+    log = np.loadtxt(log_file)
+
+    assert np.array_equal(reader.steps, np.arange(20))
+    assert np.allclose(reader[5][ids], expected[5])
+    assert np.array_equal(log[:, 0], np.arange(20))
+    assert np.allclose(log[:, 1:], [-1.5, 0.25, 0.5])
+
+
+def test_buffered_writer_drops_frames():
+    sink = SlowTrajectory()
+    writer = BufferedWriter(sink, 8, capacity=2, backpressure='drop')
+    for step in range(50):
+        writer.write_frame(np.zeros((8, 3)), step=step)
+    writer.close()
+
+    assert writer.num_dropped > 0
+    assert len(sink.steps) + writer.num_dropped == 50
+
+
+def test_run_flushes_on_error(tmp_path):
+    class FailingIntegrator(mcpy.integrator.Integrator):
+        def __call__(self, *args, **kwargs):
+            if mc.step > 30:
+                raise RuntimeError("stop")
+            return super().__call__(*args, **kwargs)
+
+    np.random.seed(12)
+    box = mcpy.box.Box(np.full(3, 6.0))
+    mc = mcpy.mcsimulation.MCSimulation()
+    mc.add_box(box)
+    mc.add_particles(mcpy.particles.Particles.from_random(20, box.box_dims))
+    mc.add_potential(mcpy.pairwise.LJ(cutoff=2.5))
+    mc.add_integrator(FailingIntegrator(1.0))
+    sink = SlowTrajectory()
+    mc.add_trajectory(BufferedWriter(sink, 20, capacity=64), stride=1)
+    with pytest.raises(RuntimeError):
+        mc.run(100, supress_output=True)
+
+    assert sink.steps == list(range(1, 31))
+
+
+class FailingWriter(SlowTrajectory):
+    def write_frame(self, coordinates, step=0, energy=0.0, ids=None):
+        self.steps.append(step)
+
+    def write_log(self, step, energy, acceptance_rates):
+        self.steps.append(step)
+
+    def flush(self):
+        raise OSError("disk full")
+
+
+class FlushCounter(FailingWriter):
+    def flush(self):
+        self.steps.append('flushed')
+
+
+@pytest.mark.parametrize("fail_at", [None, 5])
+def test_run_flushes_every_writer(fail_at):
+    class FailingIntegrator(mcpy.integrator.Integrator):
+        def __call__(self, *args, **kwargs):
+            if mc.step == fail_at:
+                raise RuntimeError("stop")
+            return super().__call__(*args, **kwargs)
+
+    np.random.seed(12)
+    box = mcpy.box.Box(np.full(3, 6.0))
+    mc = mcpy.mcsimulation.MCSimulation(frequency=2)
+    mc.add_box(box)
+    mc.add_particles(mcpy.particles.Particles.from_random(20, box.box_dims))
+    mc.add_potential(mcpy.pairwise.LJ(cutoff=2.5))
+    mc.add_integrator(FailingIntegrator(1.0))
+    mc.add_trajectory(FailingWriter())
+    log_writer = FlushCounter()
+    mc.add_log_writer(log_writer)
+    # A failing run reports its own error, a clean one the writer error.
+    expected = OSError if fail_at is None else RuntimeError
+    with pytest.raises(expected):
+        mc.run(10, supress_output=True)
+
+    assert log_writer.steps[-1] == 'flushed'
+
+
+def test_compressed_round_trip(tmp_path):
+    np.random.seed(13)
+    box = mcpy.box.Box(np.array([5.0, 6.0, 7.0]))
+    frames = np.empty((25, 40, 3))
+    frames[0] = (np.random.rand(40, 3) - 0.5) * box.box_dims
+    for k in range(1, 25):
+        frames[k] = frames[k - 1]
+        frames[k, np.random.randint(40)] += np.random.rand(3) - 0.5
+    file_name = str(tmp_path / 'run.trz')
+    with CompressedTrajectoryWriter(file_name, 40, box, precision=1e-5,
+                                    frames_per_chunk=10) as traj:
+        for step, frame in enumerate(frames):
+            traj.write_frame(frame, step=step, energy=0.5 * step)
+    reader = CompressedTrajectoryReader(file_name)
+    tolerance = 0.5e-5 * box.box_dims.max()
+
+    assert len(reader) == 25
+    assert np.array_equal(reader.steps, np.arange(25))
+    assert np.allclose(reader.energies, 0.5 * np.arange(25))
+    assert np.allclose(reader.read(), frames, rtol=0, atol=tolerance)
+    assert np.allclose(reader[13], frames[13], rtol=0, atol=tolerance)
+    assert np.allclose(reader[-1], frames[-1], rtol=0, atol=tolerance)
+    assert os.path.getsize(file_name) < 0.1 * frames.nbytes
@@ -0,0 +1,674 @@
+"""
+trajectory.py
+Native binary trajectory format of mcpy.
+
+A file holds a fixed size header followed by fixed size frame records, so
+frame k starts at `header_size + k * frame_size` and the frames can be read
+through `np.memmap` without any parsing. Each record holds the MC step, the
+energy and the coordinates in original particle order.
+
+For archiving there is also a lossy compressed format, which quantizes the
+coordinates and stores integer differences between successive frames.
+"""
+
+import os
+import queue
+import threading
+import zlib
+import numpy as np
+
+MAGIC = b'MCPYTRJ1'
+COMPRESSED_MAGIC = b'MCPYTRZ1'
+
+HEADER_DTYPE = np.dtype([('magic', 'S8'),
+                         ('num_particles', '<u8'),
+                         ('num_frames', '<u8'),
+                         ('precision', 'S4'),
+                         ('reserved', 'S4'),
+                         ('cell', '<f8', (3, 3))])
+
+COMPRESSED_HEADER_DTYPE = np.dtype([('magic', 'S8'),
+                                    ('num_particles', '<u8'),
+                                    ('precision', '<f8'),
+                                    ('box_dims', '<f8', 3),
+                                    ('cell', '<f8', (3, 3))])
+
+CHUNK_HEADER_DTYPE = np.dtype([('num_frames', '<u8'),
+                               ('num_bytes', '<u8')])
+
+
+def frame_dtype(num_particles, precision):
+    """Record layout of one frame.
+
+    Parameters
+    ----------
+    num_particles : int
+        Number of particles per frame.
+    precision : np.dtype
+        Storage type of the coordinates, float32 or float64.
+
+    Returns
+    -------
+    dtype : np.dtype
+        Structured dtype with fields step, energy and coordinates.
+    """
+    return np.dtype([('step', '<i8'),
+                     ('energy', '<f8'),
+                     ('coordinates', np.dtype(precision).newbyteorder('<'),
+                      (num_particles, 3))])
+
+
+class TrajectoryWriter:
+    """Writes frames to a binary trajectory file.
+
+    Parameters
+    ----------
+    file_name : str
+        Path of the file to create. An existing file is overwritten.
+    num_particles : int
+        Number of particles per frame.
+    box : Box
+        The simulation box, its cell matrix is stored in the header.
+    precision : np.dtype, optional, default : np.float32
+        Storage type of the coordinates, float32 or float64.
+
+    Returns
+    -------
+    self : TrajectoryWriter
+        Returns an instance of itself.
+
+    Attributes
+    ----------
+    file_name : str
+        Path of the trajectory file.
+    num_frames : int
+        Number of frames written so far.
+    """
+    def __init__(self, file_name, num_particles, box, precision=np.float32):
+        if np.dtype(precision) not in (np.float32, np.float64):
+            raise ValueError("Trajectories store float32 or float64.")
+        self.file_name = file_name
+        self.num_frames = 0
+        self._header = np.zeros(1, dtype=HEADER_DTYPE)
+        self._header['magic'] = MAGIC
+        self._header['num_particles'] = num_particles
+        self._header['precision'] = np.dtype(precision).str.encode()
+        self._header['cell'] = box.cell
+        self._record = np.zeros(1, dtype=frame_dtype(num_particles,
+                                                     precision))
+        self._handle = open(file_name, 'wb')
+        self._handle.write(self._header.tobytes())
+
+    def write_frame(self, coordinates, step=0, energy=0.0, ids=None):
+        """Append one frame.
+
+        Parameters
+        ----------
+        coordinates : np.array
+            Array of shape (n, 3) of the particle coordinates.
+        step : int, optional
+            The MC step of the frame.
+        energy : float, optional
+            The total energy of the frame.
+        ids : np.array, optional
+            Original particle id of each row of `coordinates`. Rows are
+            stored in id order.
+
+        Returns
+        -------
+        None
+        """
+        self._record['step'] = step
+        self._record['energy'] = energy
+        if ids is None:
+            self._record['coordinates'][0] = coordinates
+        else:
+            self._record['coordinates'][0][ids] = coordinates
+        self._handle.write(self._record.tobytes())
+        self.num_frames += 1
+
+    def flush(self):
+        """Record the frame count in the header and flush to disk."""
+        self._header['num_frames'] = self.num_frames
+        position = self._handle.tell()
+        self._handle.seek(0)
+        self._handle.write(self._header.tobytes())
+        self._handle.seek(position)
+        self._handle.flush()
+
+    def close(self):
+        """Flush and close the file."""
+        if not self._handle.closed:
+            self.flush()
+            self._handle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class TrajectoryReader:
+    """Random access to the frames of a binary trajectory file.
+
+    Frames are memory mapped, so indexing returns views into the file and
+    nothing is read until the data is used.
+
+    Parameters
+    ----------
+    file_name : str
+        Path of the trajectory file.
+
+    Returns
+    -------
+    self : TrajectoryReader
+        Returns an instance of itself.
+
+    Attributes
+    ----------
+    num_particles : int
+        Number of particles per frame.
+    num_frames : int
+        Number of complete frames in the file.
+    cell : np.array
+        The cell matrix of the simulation box.
+    frames : np.memmap
+        All frame records, with fields step, energy and coordinates.
+    """
+    def __init__(self, file_name):
+        header = np.fromfile(file_name, dtype=HEADER_DTYPE, count=1)
+        if len(header) != 1 or header['magic'][0] != MAGIC:
+            raise ValueError("{} is not an mcpy trajectory."
+                             .format(file_name))
+        self.num_particles = int(header['num_particles'][0])
+        self.cell = header['cell'][0]
+        record = frame_dtype(self.num_particles,
+                             header['precision'][0].decode())
+        # Count frames from the file size, so frames written after the last
+        # header update are still found.
+        self.num_frames = (os.path.getsize(file_name) -
+                           HEADER_DTYPE.itemsize) // record.itemsize
+        if self.num_frames:
+            self.frames = np.memmap(file_name, dtype=record, mode='r',
+                                    offset=HEADER_DTYPE.itemsize,
+                                    shape=(self.num_frames,))
+        else:
+            self.frames = np.zeros(0, dtype=record)
+
+    @property
+    def offsets(self):
+        """Byte offset of each frame in the file."""
+        return HEADER_DTYPE.itemsize + \
+            self.frames.dtype.itemsize * np.arange(self.num_frames)
+
+    @property
+    def coordinates(self):
+        """Array of shape (num_frames, n, 3) viewing all coordinates."""
+        return self.frames['coordinates']
+
+    @property
+    def steps(self):
+        """The MC step of each frame."""
+        return self.frames['step']
+
+    @property
+    def energies(self):
+        """The total energy of each frame."""
+        return self.frames['energy']
+
+    def __len__(self):
+        return self.num_frames
+
+    def __getitem__(self, index):
+        return self.frames['coordinates'][index]
+
+
+class BufferedWriter:
+    """Moves trajectory and log output off the simulation thread.
+
+    Frames are copied into a ring of preallocated buffers and a background
+    thread drains them to the wrapped trajectory, so the MC loop only pays
+    for a copy. Log rows of step, energy and acceptance rates go through the
+    same queue to a text file.
+
+    Parameters
+    ----------
+    trajectory : TrajectoryWriter or None
+        Where frames are written, None if only logging.
+    num_particles : int
+        Number of particles per frame.
+    capacity : int, optional, default : 16
+        Number of frame buffers in the ring.
+    backpressure : str, optional, default : 'block'
+        What `write_frame` does when every buffer is in use: 'block' waits
+        for one to free up, 'drop' discards the frame.
+    log_file : str, optional
+        Path of a text file receiving the log rows.
+
+    Returns
+    -------
+    self : BufferedWriter
+        Returns an instance of itself.
+
+    Attributes
+    ----------
+    trajectory : TrajectoryWriter or None
+        Where frames are written.
+    backpressure : str
+        'block' or 'drop'.
+    num_dropped : int
+        Number of frames discarded because the ring was full.
+    """
+    def __init__(self, trajectory, num_particles, capacity=16,
+                 backpressure='block', log_file=None):
+        if backpressure not in ('block', 'drop'):
+            raise ValueError("backpressure must be 'block' or 'drop'.")
+        self.trajectory = trajectory
+        self.backpressure = backpressure
+        self.num_dropped = 0
+        self._coordinates = np.empty((capacity, num_particles, 3))
+        self._ids = np.empty((capacity, num_particles), dtype=int)
+        self._free = queue.Queue()
+        for slot in range(capacity):
+            self._free.put(slot)
+        self._pending = queue.Queue()
+        self._error = None
+        self._log = None
+        if log_file is not None:
+            self._log = open(log_file, 'w')
+            self._log.write('# step energy acceptance_rates\n')
+        self._thread = threading.Thread(target=self._drain, daemon=True)
+        self._thread.start()
+
+    def write_frame(self, coordinates, step=0, energy=0.0, ids=None):
+        """Queue one frame for writing.
+
+        Parameters
+        ----------
+        coordinates : np.array
+            Array of shape (n, 3) of the particle coordinates.
+        step : int, optional
+            The MC step of the frame.
+        energy : float, optional
+            The total energy of the frame.
+        ids : np.array, optional
+            Original particle id of each row of `coordinates`.
+
+        Returns
+        -------
+        None
+        """
+        try:
+            slot = self._free.get(block=self.backpressure == 'block')
+        except queue.Empty:
+            self.num_dropped += 1
+            return
+        self._coordinates[slot] = coordinates
+        if ids is not None:
+            self._ids[slot] = ids
+        self._pending.put(('frame', slot, step, energy, ids is not None))
+
+    def write_log(self, step, energy, acceptance_rates):
+        """Queue one log row.
+
+        Parameters
+        ----------
+        step : int
+            The MC step.
+        energy : float
+            The total energy.
+        acceptance_rates : np.array
+            The acceptance rate of each integrator.
+
+        Returns
+        -------
+        None
+        """
+        self._pending.put(('log', step, energy, tuple(acceptance_rates)))
+
+    def _drain(self):
+        while True:
+            item = self._pending.get()
+            try:
+                if item is None:
+                    return
+                if item[0] == 'frame':
+                    _, slot, step, energy, has_ids = item
+                    try:
+                        if self.trajectory is not None:
+                            self.trajectory.write_frame(
+                                self._coordinates[slot], step=step,
+                                energy=energy,
+                                ids=self._ids[slot] if has_ids else None)
+                    finally:
+                        self._free.put(slot)
+                elif self._log is not None:
+                    _, step, energy, rates = item
+                    values = [repr(float(value)) for value in
+                              (energy,) + rates]
+                    self._log.write('{} {}\n'.format(step,
+                                                     ' '.join(values)))
+            except Exception as error:
+                self._error = error
+            finally:
+                self._pending.task_done()
+
+    def flush(self):
+        """Wait for every queued item to be written, then flush to disk.
+
+        Raises any error met by the background thread.
+        """
+        self._pending.join()
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+        if self.trajectory is not None:
+            self.trajectory.flush()
+        if self._log is not None:
+            self._log.flush()
+
+    def close(self):
+        """Flush, stop the background thread and close the outputs."""
+        if not self._thread.is_alive():
+            return
+        try:
+            self.flush()
+        finally:
+            self._pending.put(None)
+            self._thread.join()
+            if self.trajectory is not None:
+                self.trajectory.close()
+            if self._log is not None:
+                self._log.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def compress_frames(frames, box_dims, precision=1e-4, level=6):
+    """Quantize and delta encode a block of frames.
+
+    Coordinates are rounded to multiples of `precision * box_dims`, the
+    first frame is kept as is and every later frame as its integer
+    difference to the one before, which is mostly zero for MC runs. The
+    result is deflated with zlib.
+
+    Parameters
+    ----------
+    frames : np.array
+        Array of shape (f, n, 3) of coordinates.
+    box_dims : np.array
+        The box lengths the precision is relative to.
+    precision : float, optional, default : 1e-4
+        Quantization step as a fraction of the box length.
+    level : int, optional, default : 6
+        zlib compression level.
+
+    Returns
+    -------
+    data : bytes
+        The compressed frames.
+    """
+    scale = 1.0 / (precision * np.asarray(box_dims, dtype=float))
+    quantized = np.rint(np.asarray(frames) * scale).astype(np.int64)
+    deltas = np.diff(quantized, axis=0, prepend=0)
+    if deltas.size and np.abs(deltas).max() >= 2**31:
+        raise ValueError("Coordinates out of range for this precision.")
+    return zlib.compress(deltas.astype('<i4').tobytes(), level)
+
+
+def decompress_frames(data, num_particles, box_dims, precision=1e-4):
+    """Reverse `compress_frames`.
+
+    Parameters
+    ----------
+    data : bytes
+        The compressed frames.
+    num_particles : int
+        Number of particles per frame.
+    box_dims : np.array
+        The box lengths the precision is relative to.
+    precision : float, optional, default : 1e-4
+        Quantization step as a fraction of the box length.
+
+    Returns
+    -------
+    frames : np.array
+        Array of shape (f, n, 3) of coordinates, each within half a
+        quantization step of the original.
+    """
+    deltas = np.frombuffer(zlib.decompress(data), dtype='<i4')
+    quantized = np.cumsum(deltas.reshape(-1, num_particles, 3), axis=0,
+                          dtype=np.int64)
+    return quantized * (precision * np.asarray(box_dims, dtype=float))
+
+
+class CompressedTrajectoryWriter:
+    """Writes frames to a lossy compressed trajectory file.
+
+    Frames are gathered into chunks of `frames_per_chunk` and each chunk is
+    compressed with `compress_frames` as a whole.
+
+    Parameters
+    ----------
+    file_name : str
+        Path of the file to create. An existing file is overwritten.
+    num_particles : int
+        Number of particles per frame.
+    box : Box
+        The simulation box, the precision is relative to its box_dims.
+    precision : float, optional, default : 1e-4
+        Quantization step as a fraction of the box length.
+    frames_per_chunk : int, optional, default : 100
+        Number of frames compressed together.
+    level : int, optional, default : 6
+        zlib compression level.
+
+    Returns
+    -------
+    self : CompressedTrajectoryWriter
+        Returns an instance of itself.
+
+    Attributes
+    ----------
+    file_name : str
+        Path of the trajectory file.
+    num_frames : int
+        Number of frames written so far.
+    """
+    def __init__(self, file_name, num_particles, box, precision=1e-4,
+                 frames_per_chunk=100, level=6):
+        self.file_name = file_name
+        self.num_frames = 0
+        self.precision = precision
+        self.level = level
+        self.box_dims = np.array(box.box_dims, dtype=float)
+        self._coordinates = np.empty((frames_per_chunk, num_particles, 3))
+        self._steps = np.empty(frames_per_chunk, dtype='<i8')
+        self._energies = np.empty(frames_per_chunk, dtype='<f8')
+        self._buffered = 0
+        header = np.zeros(1, dtype=COMPRESSED_HEADER_DTYPE)
+        header['magic'] = COMPRESSED_MAGIC
+        header['num_particles'] = num_particles
+        header['precision'] = precision
+        header['box_dims'] = self.box_dims
+        header['cell'] = box.cell
+        self._handle = open(file_name, 'wb')
+        self._handle.write(header.tobytes())
+
+    def write_frame(self, coordinates, step=0, energy=0.0, ids=None):
+        """Append one frame.
+
+        Parameters
+        ----------
+        coordinates : np.array
+            Array of shape (n, 3) of the particle coordinates.
+        step : int, optional
+            The MC step of the frame.
+        energy : float, optional
+            The total energy of the frame.
+        ids : np.array, optional
+            Original particle id of each row of `coordinates`. Rows are
+            stored in id order.
+
+        Returns
+        -------
+        None
+        """
+        frame = self._buffered
+        if ids is None:
+            self._coordinates[frame] = coordinates
+        else:
+            self._coordinates[frame][ids] = coordinates
+        self._steps[frame] = step
+        self._energies[frame] = energy
+        self._buffered += 1
+        self.num_frames += 1
+        if self._buffered == len(self._steps):
+            self._write_chunk()
+
+    def _write_chunk(self):
+        if self._buffered == 0:
+            return
+        num_frames = self._buffered
+        data = compress_frames(self._coordinates[:num_frames], self.box_dims,
+                               self.precision, self.level)
+        header = np.zeros(1, dtype=CHUNK_HEADER_DTYPE)
+        header['num_frames'] = num_frames
+        header['num_bytes'] = len(data)
+        self._handle.write(header.tobytes())
+        self._handle.write(self._steps[:num_frames].tobytes())
+        self._handle.write(self._energies[:num_frames].tobytes())
+        self._handle.write(data)
+        self._buffered = 0
+
+    def flush(self):
+        """Compress the frames gathered so far and flush to disk."""
+        self._write_chunk()
+        self._handle.flush()
+
+    def close(self):
+        """Flush and close the file."""
+        if not self._handle.closed:
+            self.flush()
+            self._handle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class CompressedTrajectoryReader:
+    """Reads a lossy compressed trajectory file.
+
+    The chunk headers are indexed when the file is opened; a chunk is only
+    decompressed when one of its frames is requested.
+
+    Parameters
+    ----------
+    file_name : str
+        Path of the trajectory file.
+
+    Returns
+    -------
+    self : CompressedTrajectoryReader
+        Returns an instance of itself.
+
+    Attributes
+    ----------
+    num_particles : int
+        Number of particles per frame.
+    num_frames : int
+        Number of frames in the file.
+    precision : float
+        Quantization step as a fraction of the box length.
+    box_dims : np.array
+        The box lengths the precision is relative to.
+    cell : np.array
+        The cell matrix of the simulation box.
+    steps : np.array
+        The MC step of each frame.
+    energies : np.array
+        The total energy of each frame.
+    """
+    def __init__(self, file_name):
+        self.file_name = file_name
+        with open(file_name, 'rb') as handle:
+            header = np.fromfile(handle, dtype=COMPRESSED_HEADER_DTYPE,
+                                 count=1)
+            if len(header) != 1 or header['magic'][0] != COMPRESSED_MAGIC:
+                raise ValueError("{} is not a compressed mcpy trajectory."
+                                 .format(file_name))
+            self.num_particles = int(header['num_particles'][0])
+            self.precision = float(header['precision'][0])
+            self.box_dims = header['box_dims'][0]
+            self.cell = header['cell'][0]
+            steps, energies, self._chunks = [], [], []
+            while True:
+                chunk = np.fromfile(handle, dtype=CHUNK_HEADER_DTYPE,
+                                    count=1)
+                if len(chunk) == 0:
+                    break
+                num_frames = int(chunk['num_frames'][0])
+                steps.append(np.fromfile(handle, dtype='<i8',
+                                         count=num_frames))
+                energies.append(np.fromfile(handle, dtype='<f8',
+                                            count=num_frames))
+                self._chunks.append((handle.tell(),
+                                     int(chunk['num_bytes'][0])))
+                handle.seek(self._chunks[-1][1], os.SEEK_CUR)
+        self.steps = np.concatenate([np.zeros(0, dtype='<i8')] + steps)
+        self.energies = np.concatenate([np.zeros(0)] + energies)
+        self.num_frames = len(self.steps)
+        self._chunk_starts = np.cumsum([0] + [len(s) for s in steps])
+        self._cached = (None, None)
+
+    def read_chunk(self, chunk):
+        """Decompress every frame of one chunk.
+
+        Parameters
+        ----------
+        chunk : int
+            Index of the chunk.
+
+        Returns
+        -------
+        frames : np.array
+            Array of shape (f, n, 3) of the coordinates in the chunk.
+        """
+        if self._cached[0] != chunk:
+            offset, num_bytes = self._chunks[chunk]
+            with open(self.file_name, 'rb') as handle:
+                handle.seek(offset)
+                data = handle.read(num_bytes)
+            self._cached = (chunk, decompress_frames(
+                data, self.num_particles, self.box_dims, self.precision))
+        return self._cached[1]
+
+    def read(self):
+        """Decompress all frames.
+
+        Returns
+        -------
+        frames : np.array
+            Array of shape (num_frames, n, 3) of coordinates.
+        """
+        frames = [self.read_chunk(chunk) for chunk in range(len(self._chunks))]
+        return np.concatenate([np.zeros((0, self.num_particles, 3))] + frames)
+
+    def __len__(self):
+        return self.num_frames
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.num_frames
+        if not 0 <= index < self.num_frames:
+            raise IndexError("Frame index out of range.")
+        chunk = np.searchsorted(self._chunk_starts, index, side='right') - 1
+        return self.read_chunk(chunk)[index - self._chunk_starts[chunk]]
@@ -0,0 +1,156 @@
+"""
+xyz.py
+Streaming reader for single and multi-frame XYZ files, plain or gzipped.
+"""
+
+import collections
+import gzip
+import itertools
+import numpy as np
+
+
+def _open(file_name):
+    if str(file_name).endswith('.gz'):
+        return gzip.open(file_name, 'rb')
+    return open(file_name, 'rb')
+
+
+def _skip_lines(handle, num_lines):
+    collections.deque(itertools.islice(handle, num_lines), maxlen=0)
+
+
+def _read_header(handle):
+    '''Reads the particle count and comment line, None at end of file.'''
+    line = handle.readline()
+    if not line.strip():
+        return None
+    num_particles = int(line)
+    handle.readline()
+    return num_particles
+
+
+def _read_coordinates(handle, num_particles, dtype, chunk_size):
+    coordinates = np.empty((num_particles, 3), dtype=dtype)
+    for start in range(0, num_particles, chunk_size):
+        num_lines = min(chunk_size, num_particles - start)
+        chunk = np.loadtxt(handle, usecols=(1, 2, 3), max_rows=num_lines,
+                           ndmin=2)
+        if len(chunk) != num_lines:
+            raise ValueError("Truncated XYZ frame: expected {} particles."
+                             .format(num_particles))
+        coordinates[start:start + num_lines] = chunk
+    return coordinates
+
+
+def iter_frames(file_name, dtype=np.float64, chunk_size=65536):
+    ''' Lazily iterates over the frames of an XYZ file.
+
+    Parameters:
+    -----------
+        file_name : str
+            Path to the XYZ file. Files ending in .gz are decompressed on the
+            fly.
+        dtype : np.dtype, optional
+            Precision of the returned coordinates.
+        chunk_size : int, optional
+            Number of lines parsed at once, bounds the temporary memory.
+
+    Yields:
+    -------
+        coordinates : np.array
+            Array of shape (n, 3) with the coordinates of each frame.
+    '''
+    with _open(file_name) as handle:
+        while True:
+            num_particles = _read_header(handle)
+            if num_particles is None:
+                return
+            yield _read_coordinates(handle, num_particles, dtype, chunk_size)
+
+
+def count_frames(file_name):
+    ''' Counts the frames of an XYZ file without parsing coordinates.
+
+    Parameters:
+    -----------
+        file_name : str
+            Path to the XYZ file, optionally gzipped.
+
+    Returns:
+    --------
+        num_frames : int
+            Number of frames in the file.
+    '''
+    num_frames = 0
+    with _open(file_name) as handle:
+        while True:
+            num_particles = _read_header(handle)
+            if num_particles is None:
+                return num_frames
+            _skip_lines(handle, num_particles)
+            num_frames += 1
+
+
+def read_frame(file_name, frame=0, dtype=np.float64, chunk_size=65536):
+    ''' Reads a single frame of an XYZ file in one pass.
+
+    Frames before the requested one are skipped line by line without being
+    parsed. For negative indices the lines of the last few frames are kept
+    while reading through, so the end need not be found first. The first
+    frame is parsed by `np.loadtxt` from the path, which reads in blocks
+    rather than line by line as for an open file.
+
+    Parameters:
+    -----------
+        file_name : str
+            Path to the XYZ file, optionally gzipped.
+        frame : int, optional
+            Index of the frame to read, negative values count from the end.
+        dtype : np.dtype, optional
+            Precision of the returned coordinates.
+        chunk_size : int, optional
+            Number of lines parsed at once, bounds the temporary memory.
+
+    Returns:
+    --------
+        coordinates : np.array
+            Array of shape (n, 3) with the coordinates of the frame.
+    '''
+    with _open(file_name) as handle:
+        if frame < 0:
+            return _read_from_end(handle, -frame, dtype)
+        for _ in range(frame):
+            num_particles = _read_header(handle)
+            if num_particles is None:
+                raise IndexError("Frame index out of range.")
+            _skip_lines(handle, num_particles)
+        num_particles = _read_header(handle)
+        if num_particles is None:
+            raise IndexError("Frame index out of range.")
+        if frame > 0:
+            return _read_coordinates(handle, num_particles, dtype,
+                                     chunk_size)
+    coordinates = np.loadtxt(file_name, dtype=dtype, usecols=(1, 2, 3),
+                             skiprows=2, max_rows=num_particles, ndmin=2)
+    if len(coordinates) != num_particles:
+        raise ValueError("Truncated XYZ frame: expected {} particles."
+                         .format(num_particles))
+    return coordinates
+
+
+def _read_from_end(handle, from_end, dtype):
+    '''Parses the frame `from_end` frames before the end of the file.'''
+    recent = collections.deque(maxlen=from_end)
+    while True:
+        num_particles = _read_header(handle)
+        if num_particles is None:
+            break
+        lines = list(itertools.islice(handle, num_particles))
+        if len(lines) != num_particles:
+            raise ValueError("Truncated XYZ frame: expected {} particles."
+                             .format(num_particles))
+        recent.append(lines)
+    if len(recent) < from_end:
+        raise IndexError("Frame index out of range.")
+    return np.loadtxt(recent[0], dtype=dtype, usecols=(1, 2, 3),
+                      ndmin=2).reshape(-1, 3)